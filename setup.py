@@ -36,7 +36,8 @@ setup(
         ],
         'duckdb': [
             'duckdb',
-            'pandas'
+            'pandas',
+            'pyarrow'
         ]
     }
 )
@@ -0,0 +1,108 @@
+import asyncio
+import inspect
+import os
+import tempfile
+from os import PathLike
+from typing import Callable, Any, Dict, Optional, Tuple, Union
+
+from .notebook.kernels import PythonNotebook
+from .notebook.kernels import runtime
+from .notebook.util import run_cpu
+
+
+def _load_and_write(path: str, fun: Optional[Callable[[], Any]], read_csv_kwargs: Dict[str, Any], cache_path: str):
+    if fun is not None:
+        frame = fun()
+    else:
+        import pandas as pd
+        frame = pd.read_csv(path, **read_csv_kwargs)
+
+    runtime.write_dataset(frame, cache_path)
+
+
+class JPDataset:
+    """
+    decorator to use with functions loading a dataset that is shared by all kernels
+    """
+    DATASETS: Dict[str, 'JPDataset'] = {}
+    CACHE_DIR: Optional[str] = None
+
+    def __init__(self, path: Union[str, PathLike], patch_read_csv: bool = True, **read_csv_kwargs):
+        """
+        :param path: path of the csv file as used in notebooks
+        :param patch_read_csv: let `pd.read_csv` in notebooks return the cached dataset
+                               if called with this path and exactly `read_csv_kwargs`
+        :param read_csv_kwargs: keyword arguments for `pd.read_csv` used to load the file
+                                if no function is decorated
+        """
+        self.path: str = os.path.abspath(path)
+        self.patch_read_csv: bool = patch_read_csv
+        self.read_csv_kwargs: Dict[str, Any] = read_csv_kwargs
+
+        self._fun: Optional[Callable[[], Any]] = None
+        self._cache: Optional['asyncio.Future[str]'] = None
+
+        JPDataset.DATASETS[self.path] = self
+
+    def __call__(self, fun: Callable[[], Any]):
+        self._fun = fun
+        return fun
+
+    async def __load(self) -> str:
+        fd, cache_path = tempfile.mkstemp(prefix='jptest_', suffix='.arrow',
+                                          dir=JPDataset.CACHE_DIR or PythonNotebook.transfer_dir())
+        os.close(fd)
+
+        try:
+            if inspect.iscoroutinefunction(self._fun):
+                await run_cpu(runtime.write_dataset, await self._fun(), cache_path)
+            else:
+                await run_cpu(_load_and_write, self.path, self._fun, self.read_csv_kwargs, cache_path)
+        except BaseException:
+            os.remove(cache_path)
+            raise
+
+        return cache_path
+
+    async def cache(self) -> str:
+        """
+        load and convert the dataset once per run
+
+        :return: path to the cache file
+        """
+        if self._cache is None:
+            self._cache = asyncio.ensure_future(self.__load())
+
+        return await self._cache
+
+    @staticmethod
+    async def prepare():
+        """
+        load all registered datasets in parallel
+        """
+        await asyncio.gather(*[dataset.cache() for dataset in JPDataset.DATASETS.values()])
+
+    @staticmethod
+    def served() -> Dict[str, Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        get all loaded datasets to serve in kernels
+
+        :return: csv paths mapped to cache file paths and `read_csv` keyword arguments (None if not patched)
+        """
+        return {
+            path: (dataset._cache.result(), dataset.read_csv_kwargs if dataset.patch_read_csv else None)
+            for path, dataset in JPDataset.DATASETS.items()
+            if dataset._cache is not None and dataset._cache.done() and dataset._cache.exception() is None
+        }
+
+    @staticmethod
+    def remove_cache():
+        """
+        delete all cache files created in this run
+        """
+        for path, _ in JPDataset.served().values():
+            if os.path.exists(path):
+                os.remove(path)
+
+        for dataset in JPDataset.DATASETS.values():
+            dataset._cache = None
@@ -0,0 +1,132 @@
+import asyncio
+import os
+from asyncio import Lock
+from contextlib import asynccontextmanager
+from os import PathLike
+from typing import Callable, Awaitable, Optional, Dict, Tuple, List, Union, AsyncIterator, Any
+
+from .JPTest import JPTest, EXECUTE_TYPE
+from .notebook import Notebook
+from .notebook.util import read_notebook
+
+
+class JPFixture:
+    """
+    decorator to use with functions preparing a notebook shared by multiple tests
+    """
+    FIXTURES: List['JPFixture'] = []
+
+    def __init__(self, scope: str = 'run', access: str = 'shared', execute: EXECUTE_TYPE = None,
+                 kernel: Optional[str] = 'python3', timeout: int = None, virtual_time: bool = False):
+        """
+        :param scope: `run` to share one notebook with all tests, `name` to share one notebook with all tests
+                      of the same name or `test` to prepare a new notebook for every test
+        :param access: `shared` to let tests use the notebook concurrently, `serialized` to let them use it
+                       one after another or `fork` to give each test its own fork (Python kernels only)
+        :param execute: cells, code and functions to execute when the notebook is created
+        :param kernel: kernel name
+        :param timeout: execution timeout in seconds (default: 2 minutes)
+        :param virtual_time: skip sleeps in notebook code (see `JPTest`)
+        """
+        if scope not in ('run', 'name', 'test'):
+            raise ValueError(f'unsupported scope {scope}')
+        if access not in ('shared', 'serialized', 'fork'):
+            raise ValueError(f'unsupported access {access}')
+
+        self.scope: str = scope
+        self.access: str = access
+
+        self._test: JPTest = JPTest(timeout=timeout, execute=execute, kernel=kernel, virtual_time=virtual_time)
+        self._fun: Optional[Callable[[Notebook], Awaitable[Any]]] = None
+
+        self._notebooks: Dict[Tuple, 'asyncio.Future[Notebook]'] = {}
+        self._users: Dict[Tuple, int] = {}
+        self._locks: Dict[Tuple, Lock] = {}
+
+        JPFixture.FIXTURES.append(self)
+
+    def __call__(self, fun: Callable[[Notebook], Awaitable[Any]]) -> "JPFixture":
+        self._fun = fun
+        return self
+
+    async def __start(self, notebook: Union[str, PathLike]) -> Notebook:
+        nb = self._test._start(await read_notebook(notebook))
+        await nb.__aenter__()
+
+        try:
+            await self._test._execute_recursively(nb, self._test._execute)
+            if self._fun is not None:
+                await self._fun(nb)
+        except BaseException as e:
+            await nb.__aexit__(type(e), e, e.__traceback__)
+            raise
+
+        return nb
+
+    def _count_users(self, test_name: Optional[str]) -> int:
+        return sum(
+            1
+            for name, tests in JPTest.TESTS.items()
+            for test in tests
+            if test.fixture is self and (self.scope == 'run' or name == test_name)
+        )
+
+    @asynccontextmanager
+    async def acquire(self, notebook: Union[str, PathLike], test_name: Optional[str]) -> AsyncIterator[Notebook]:
+        """
+        get the prepared notebook for a test
+
+        :param notebook: notebook path
+        :param test_name: name of the test
+        :return: notebook
+        """
+        if self.scope == 'test':
+            nb = await self.__start(notebook)
+            try:
+                yield nb
+            finally:
+                await nb.__aexit__(None, None, None)
+            return
+
+        key = os.path.abspath(notebook), test_name if self.scope == 'name' else None
+
+        # the notebook is started by the first test and stopped after the last one
+        if key not in self._notebooks:
+            self._notebooks[key] = asyncio.ensure_future(self.__start(notebook))
+            self._users[key] = self._count_users(test_name)
+            self._locks[key] = Lock()
+
+        try:
+            nb = await self._notebooks[key]
+
+            if self.access == 'fork':
+                async with await nb.fork() as child:
+                    yield child
+            elif self.access == 'serialized':
+                async with self._locks[key]:
+                    yield nb
+            else:
+                yield nb
+        finally:
+            self._users[key] -= 1
+            if self._users[key] <= 0:
+                await self.__close(key)
+
+    async def __close(self, key: Tuple):
+        future = self._notebooks.pop(key)
+        del self._users[key], self._locks[key]
+
+        try:
+            nb = await future
+        except Exception:
+            return
+
+        await nb.__aexit__(None, None, None)
+
+    @staticmethod
+    async def close_all():
+        """
+        stop all notebooks still running, e.g. if only some tests were executed
+        """
+        for fixture in JPFixture.FIXTURES:
+            await asyncio.gather(*[fixture.__close(key) for key in list(fixture._notebooks)])
@@ -1,13 +1,22 @@
 import asyncio
+import os
+import shutil
+from contextlib import asynccontextmanager, AsyncExitStack
 from os import PathLike
 from types import FunctionType
-from typing import List, Tuple, Dict, Callable, AsyncIterable, Awaitable, AsyncGenerator, Iterable
-from typing import Union, Optional, Protocol
+from typing import List, Tuple, Dict, Callable, AsyncIterable, Awaitable, AsyncGenerator, Iterable, AsyncIterator
+from typing import Union, Optional, Protocol, TYPE_CHECKING, Any, TypeVar
 
 import aiofiles
+from nbformat import NotebookNode
 
-from .notebook import Notebook
+from .JPDataset import JPDataset
+from .notebook import Notebook, NotebookGroup
 from .notebook.kernels import *
+from .notebook.util import read_notebook
+
+if TYPE_CHECKING:
+    from .JPFixture import JPFixture
 
 
 class JPTestFunction(Protocol):
@@ -15,6 +24,8 @@ class JPTestFunction(Protocol):
         ...
 
 
+T = TypeVar('T')
+
 EXECUTE_TYPE = Union[Tuple[str], Tuple[str, str], str, Callable, PathLike, List['EXECUTE_TYPE']]
 
 
@@ -23,27 +34,62 @@ class JPTest:
     decorator to use with test functions
     """
     TESTS: Dict[str, List['JPTest']] = {}
+    TEMPLATES: Dict[Tuple, 'asyncio.Future[str]'] = {}
+    SHARED: Dict[Tuple, 'asyncio.Future[PythonNotebook]'] = {}
+    SHARED_USERS: Dict[Tuple, int] = {}
     DEFAULT_TIMEOUT = 120
+    KERNEL_PROVIDER: Optional[ZygoteKernelProvider] = None
 
     def __init__(self, name: str = None, max_score: Union[float, int] = 0, timeout: int = None,
                  execute: EXECUTE_TYPE = None, prepare_second: bool = False,
-                 kernel: Optional[str] = 'python3'):
+                 kernel: Optional[str] = 'python3', prepare_replicas: Optional[int] = None,
+                 template: EXECUTE_TYPE = None, virtual_time: bool = False, fixture: Optional['JPFixture'] = None,
+                 params: Optional[List[Any]] = None, ids: Optional[List[str]] = None, isolated: bool = False):
         """
         :param name: name used in the output
         :param max_score: maximum score (can be exceeded, used to calculate total score)
         :param timeout: execution timeout in seconds (default: 2 minutes)
         :param execute: cells, code and functions to execute prior to the test
         :param prepare_second: create two notebooks and use `execute` with both in parallel
+        :param prepare_replicas: create a NotebookGroup of n notebooks and use `execute` with all in parallel
+        :param template: cells, code and functions to execute only once per run (SQL kernels only),
+                         every notebook starts with a copy of the resulting database
+        :param virtual_time: skip `time.sleep` and `asyncio.sleep` in notebook code and advance `time`,
+                             `datetime` and `asyncio` clocks by the same amount instead (Python kernels only)
+        :param fixture: use the notebook prepared by a `JPFixture` instead of starting a new one,
+                        `execute` is run in it before the test
+        :param params: run the test function once per parameter set with the same prepared notebook(s) and
+                       report each case separately with `max_score`, tuples are passed as positional
+                       arguments, dicts as keyword arguments and other values as a single argument,
+                       cases in Python notebooks run in `PythonNotebook.isolate` namespaces, while cases
+                       in replicas or other kernels share all state of the prepared notebook(s)
+        :param ids: names of the parameter sets used in the output (default: their representation)
+        :param isolated: share one kernel with all isolated tests using the same `execute`, which is only run once,
+                         and run the test in its own copy of the prepared variables (Python kernels only),
+                         see `PythonNotebook.isolate` for what is not isolated
         """
+        if fixture is not None and (prepare_second or prepare_replicas is not None):
+            raise ValueError('fixtures can not be used with multiple notebooks')
+        if isolated and (fixture is not None or prepare_second or prepare_replicas is not None):
+            raise ValueError('isolated tests can not be used with fixtures or multiple notebooks')
+        if ids is not None and (params is None or len(ids) != len(params)):
+            raise ValueError('ids require params of the same length')
 
         self.name: Optional[str] = name
         self.max_score: float = float(max_score)
         self.timeout: int = timeout or JPTest.DEFAULT_TIMEOUT
         self.prepare_second: bool = prepare_second
+        self.prepare_replicas: Optional[int] = prepare_replicas
         self.kernel = kernel
+        self.virtual_time: bool = virtual_time
+        self.fixture: Optional['JPFixture'] = fixture
+        self.params: Optional[List[Any]] = params
+        self.ids: Optional[List[str]] = ids
+        self.isolated: bool = isolated
 
         self._fun: JPTestFunction
         self._execute = execute if execute is not None else []
+        self._template: EXECUTE_TYPE = template
 
     def __call__(self, fun: JPTestFunction):
         self._fun: JPTestFunction = fun
@@ -59,16 +105,124 @@ class JPTest:
     def test_name(self) -> Optional[str]:
         return self._fun.__name__
 
-    def _start(self, notebook: Union[str, PathLike]):
+    def _start(self, notebook: Union[str, PathLike, NotebookNode], template: Optional[str] = None):
         if self.kernel == 'python3':
-            return PythonNotebook(notebook, timeout=self.timeout)
+            return PythonNotebook(notebook, timeout=self.timeout, kernel_provider=JPTest.KERNEL_PROVIDER,
+                                  virtual_time=self.virtual_time, datasets=JPDataset.served())
+        if self.virtual_time:
+            raise AssertionError(f'kernel {self.kernel} does not support virtual time')
+        if self.isolated:
+            raise AssertionError(f'kernel {self.kernel} does not support isolated tests')
         if self.kernel == 'duckdb':
-            return DuckDBNotebook(notebook)
+            return DuckDBNotebook(notebook, template=template)
         if self.kernel == 'sqlite':
-            return SQLiteNotebook(notebook)
+            return SQLiteNotebook(notebook, template=template)
 
         raise AssertionError(f'kernel {self.kernel} not supported')
 
+    @staticmethod
+    def _freeze(item: EXECUTE_TYPE):
+        if isinstance(item, (list, tuple)):
+            return tuple(JPTest._freeze(i) for i in item), type(item)
+        else:
+            return item
+
+    async def _create_template(self, notebook: Union[str, PathLike]) -> str:
+        async with self._start(await read_notebook(notebook)) as nb:
+            await self._execute_recursively(nb, self._template)
+            return await nb.snapshot()
+
+    async def _template_snapshot(self, notebook: Union[str, PathLike]) -> Optional[str]:
+        """
+        create the template database once per kernel, notebook and template
+
+        :param notebook: notebook path
+        :return: path to database file or None if no template is used
+        """
+        if self._template is None:
+            return None
+
+        if self.kernel not in ('duckdb', 'sqlite'):
+            raise AssertionError(f'kernel {self.kernel} does not support templates')
+
+        key = self.kernel, os.path.abspath(notebook), self._freeze(self._template)
+        if key not in JPTest.TEMPLATES:
+            JPTest.TEMPLATES[key] = asyncio.ensure_future(self._create_template(notebook))
+
+        return await JPTest.TEMPLATES[key]
+
+    @staticmethod
+    def remove_templates():
+        """
+        delete all template databases created in this run
+        """
+        for task in JPTest.TEMPLATES.values():
+            if task.done() and task.exception() is None:
+                shutil.rmtree(os.path.dirname(task.result()), ignore_errors=True)
+
+        JPTest.TEMPLATES = {}
+
+    def _shared_key(self, notebook: Union[str, PathLike]) -> Tuple:
+        return os.path.abspath(notebook), self._freeze(self._execute), self.kernel, self.timeout, self.virtual_time
+
+    async def _start_shared(self, notebook: Union[str, PathLike]) -> Notebook:
+        nb = self._start(await read_notebook(notebook))
+        await nb.__aenter__()
+
+        try:
+            await self._execute_recursively(nb, self._execute)
+        except BaseException as e:
+            await nb.__aexit__(type(e), e, e.__traceback__)
+            raise
+
+        return nb
+
+    @asynccontextmanager
+    async def _acquire_shared(self, notebook: Union[str, PathLike]) -> AsyncIterator[PythonNotebook]:
+        """
+        get the prepared kernel shared by all isolated tests with the same key,
+        it is started by the first test and stopped after the last one
+
+        :param notebook: notebook path
+        :return: notebook
+        """
+        key = self._shared_key(notebook)
+
+        if key not in JPTest.SHARED:
+            JPTest.SHARED[key] = asyncio.ensure_future(self._start_shared(notebook))
+            JPTest.SHARED_USERS[key] = sum(
+                1
+                for tests in JPTest.TESTS.values()
+                for test in tests
+                if test.isolated and test._shared_key(notebook) == key
+            )
+
+        try:
+            yield await JPTest.SHARED[key]
+        finally:
+            JPTest.SHARED_USERS[key] -= 1
+            if JPTest.SHARED_USERS[key] <= 0:
+                await JPTest.__close_shared(key)
+
+    @staticmethod
+    async def __close_shared(key: Tuple):
+        future = JPTest.SHARED.pop(key)
+        del JPTest.SHARED_USERS[key]
+
+        try:
+            nb = await future
+        except Exception:
+            return
+
+        await nb.__aexit__(None, None, None)
+
+    @staticmethod
+    async def close_shared():
+        """
+        stop all kernels shared by isolated tests still running, e.g. if only some tests were executed
+        """
+        await asyncio.gather(*[JPTest.__close_shared(key) for key in list(JPTest.SHARED)])
+
     @staticmethod
     async def _execute_recursively(nb: Notebook, item: EXECUTE_TYPE):
         """
@@ -151,28 +305,120 @@ class JPTest:
 
         return test_score, test_comments
 
+    async def _run_prepared(self, notebook: Union[str, PathLike], run: Callable[..., Awaitable[T]]) -> T:
+        """
+        start and prepare the notebooks used by this test
+
+        :param notebook: notebook path
+        :param run: async function receiving the prepared notebook(s)
+        :return: return value of `run`
+        """
+        template = await self._template_snapshot(notebook)
+
+        if self.fixture is not None:
+            async with self.fixture.acquire(notebook, self.name) as nb:
+                if self._execute is not None:
+                    await self._execute_recursively(nb, self._execute)
+
+                return await run(nb)
+
+        elif self.isolated:
+            async with self._acquire_shared(notebook) as shared:
+                async with await shared.isolate() as nb:
+                    return await run(nb)
+
+        elif self.prepare_replicas is not None:
+            nodes = await asyncio.gather(*[read_notebook(notebook) for _ in range(self.prepare_replicas)])
+
+            async with NotebookGroup([self._start(node, template) for node in nodes]) as group:
+                if self._execute is not None:
+                    await asyncio.gather(*[
+                        self._execute_recursively(nb, self._execute)
+                        for nb in group.notebooks
+                    ])
+
+                return await run(group)
+
+        elif not self.prepare_second:
+            async with self._start(await read_notebook(notebook), template) as nb:
+                if self._execute is not None:
+                    await self._execute_recursively(nb, self._execute)
+
+                return await run(nb)
+
+        else:
+            async with \
+                    self._start(await read_notebook(notebook), template) as left, \
+                    self._start(await read_notebook(notebook), template) as right:
+                if self._execute is not None:
+                    await asyncio.gather(*[
+                        self._execute_recursively(left, self._execute),
+                        self._execute_recursively(right, self._execute)
+                    ])
+
+                return await run(left, right)
+
     async def execute(self, notebook: Union[str, PathLike]):
         try:
-            if not self.prepare_second:
-                async with self._start(notebook) as nb:
-                    if self._execute is not None:
-                        await self._execute_recursively(nb, self._execute)
+            async def run(*notebooks):
+                fun = self._fun(*notebooks)
+                return await self._execute_fun(fun)
 
-                    fun = self._fun(nb)
-                    return *(await self._execute_fun(fun)), None
+            return *(await self._run_prepared(notebook, run)), None
 
-            else:
-                async with \
-                        self._start(notebook) as left, \
-                        self._start(notebook) as right:
-                    if self._execute is not None:
-                        await asyncio.gather(*[
-                            self._execute_recursively(left, self._execute),
-                            self._execute_recursively(right, self._execute)
-                        ])
-
-                    fun = self._fun(left, right)
-                    return *(await self._execute_fun(fun)), None
+        except Exception as e:
+            return 0, [str(e)], e
 
+    @property
+    def case_names(self) -> List[str]:
+        """
+        names used in the output for every parameter set
+        """
+        if self.ids is not None:
+            return [f'{self.name} [{i}]' for i in self.ids]
+        else:
+            return [f'{self.name} [{p!r}]' for p in self.params]
+
+    async def __execute_case(self, notebooks: Tuple, case: Any):
+        if isinstance(case, tuple):
+            args, kwargs = case, {}
+        elif isinstance(case, dict):
+            args, kwargs = (), case
+        else:
+            args, kwargs = (case,), {}
+
+        try:
+            async with AsyncExitStack() as stack:
+                # cases in Python notebooks run in their own copy of the prepared variables
+                if all(isinstance(nb, PythonNotebook) for nb in notebooks):
+                    notebooks = [await stack.enter_async_context(await nb.isolate()) for nb in notebooks]
+
+                fun = self._fun(*notebooks, *args, **kwargs)
+                return *(await self._execute_fun(fun)), None
         except Exception as e:
             return 0, [str(e)], e
+
+    async def execute_cases(self, notebook: Union[str, PathLike]) \
+            -> List[Tuple[str, float, float, List[str], Optional[Exception]]]:
+        """
+        execute the test once or once per parameter set using the same prepared notebook(s)
+
+        :param notebook: notebook path
+        :return: list of name, maximum score, score, comments and exception per case
+        """
+        if self.params is None:
+            return [(self.name, self.max_score, *await self.execute(notebook))]
+
+        async def run(*notebooks):
+            # replicas process cases concurrently, a single notebook one after another
+            if self.prepare_replicas is not None:
+                return await asyncio.gather(*[self.__execute_case(notebooks, case) for case in self.params])
+            else:
+                return [await self.__execute_case(notebooks, case) for case in self.params]
+
+        try:
+            results = await self._run_prepared(notebook, run)
+        except Exception as e:
+            results = [(0, [str(e)], e)] * len(self.params)
+
+        return [(name, self.max_score, *result) for name, result in zip(self.case_names, results)]
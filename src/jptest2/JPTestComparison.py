@@ -1,25 +1,67 @@
 import asyncio
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
 from os import PathLike
-from typing import Union, List, Optional
+from types import FunctionType
+from typing import Union, List, Optional, Dict, Any
 
 from .JPTest import JPTest, EXECUTE_TYPE
+from .notebook import Notebook
 from .notebook.kernels import PythonNotebook
+from .notebook.util import read_notebook, run_cpu
+
+
+def _read_cache(path: str) -> Optional[List[Any]]:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def _write_cache(vals: List[Any], directory: str, path: str):
+    # write to a temporary file first so that concurrent runs never read partial files
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as file:
+        pickle.dump(vals, file)
+    os.replace(temp_path, path)
 
 
 class JPTestComparison(JPTest):
     """
     decorator to use with test functions
     """
+    CACHE_DIR: Optional[Union[str, PathLike]] = None
+    CACHE: Dict[str, 'asyncio.Future[List[Any]]'] = {}
 
     def __init__(self, name: str = None, max_score: Union[float, int] = None, timeout: int = 120,
                  prepare: EXECUTE_TYPE = None, execute_left: EXECUTE_TYPE = None, execute_right: EXECUTE_TYPE = None,
-                 hold_left: Union[str, List[str]] = None, hold_right: Union[str, List[str]] = None):
+                 hold_left: Union[str, List[str]] = None, hold_right: Union[str, List[str]] = None,
+                 cache_right: bool = True):
+        """
+        :param name: name used in the output
+        :param max_score: maximum score (can be exceeded, used to calculate total score)
+        :param timeout: execution timeout in seconds (default: 2 minutes)
+        :param prepare: cells, code and functions to execute in both notebooks
+        :param execute_left: cells, code and functions to execute in the first notebook
+        :param execute_right: cells, code and functions to execute in the second notebook
+        :param hold_left: names to receive from the first notebook
+        :param hold_right: names to receive from the second notebook
+        :param cache_right: store values received from the second notebook in `CACHE_DIR` (if set)
+                            and skip the second notebook if the same items were executed before
+        """
         super().__init__(name, max_score, timeout, prepare)
 
         self._execute_left: EXECUTE_TYPE = execute_left if execute_left is not None else []
         self._execute_right: EXECUTE_TYPE = execute_right if execute_right is not None else []
         self._hold_left: Optional[Union[str, List[str]]] = hold_left
         self._hold_right: Optional[Union[str, List[str]]] = hold_right
+        self.cache_right: bool = cache_right
 
     async def __prepare(self, nb: PythonNotebook, prepare: EXECUTE_TYPE, execute: EXECUTE_TYPE, hold: List[str]):
         await self._execute_recursively(nb, prepare)
@@ -30,14 +72,128 @@ class JPTestComparison(JPTest):
 
         return vals
 
+    @staticmethod
+    def _describe(nb: Notebook, item: EXECUTE_TYPE) -> Any:
+        """
+        convert an item to a json serializable value containing everything it executes
+
+        :param nb: notebook to look up cells in
+        :param item: item to execute
+        :return: description
+        """
+        if isinstance(item, tuple):
+            if len(item) == 1:
+                cells = nb.get_code_cells(item[0])
+            elif len(item) == 2:
+                cells = nb.get_code_cells(from_tag=item[0], to_tag=item[1])
+            else:
+                raise ValueError(f'unsupported tuple length {len(item)}')
+
+            return ['cells', [c.source for c in cells]]
+
+        elif isinstance(item, str):
+            return ['code', item]
+
+        elif isinstance(item, FunctionType):
+            try:
+                return ['function', inspect.getsource(item)]
+            except (OSError, TypeError):
+                return ['function', item.__qualname__, item.__code__.co_code.hex()]
+
+        elif isinstance(item, PathLike):
+            with open(item, 'r') as file:
+                return ['file', file.read()]
+
+        elif isinstance(item, list):
+            return ['list', [JPTestComparison._describe(nb, i) for i in item]]
+
+        else:
+            raise ValueError(f'unsupported parameter type {type(item)}')
+
+    async def _cache_key(self, notebook: Union[str, PathLike], hold: List[str]) -> Optional[str]:
+        """
+        hash of everything executed in the second notebook and the held names
+
+        :param notebook: notebook path
+        :param hold: names to receive
+        :return: hex digest or None if caching is disabled
+        """
+        if JPTestComparison.CACHE_DIR is None or not self.cache_right:
+            return None
+
+        nb = Notebook(await read_notebook(notebook), None, False)
+        description = [
+            self.kernel,
+            self._describe(nb, self._execute),
+            self._describe(nb, self._execute_right),
+            hold
+        ]
+
+        return hashlib.sha256(json.dumps(description).encode('utf-8')).hexdigest()
+
+    async def __hold_right(self, notebook: Union[str, PathLike], key: str, hold: List[str]) -> List[Any]:
+        path = os.path.join(JPTestComparison.CACHE_DIR, f'{key}.pickle')
+
+        # large cached values must not block concurrent tests
+        vals = await run_cpu(_read_cache, path)
+        if vals is not None:
+            return vals
+
+        async with self._start(await read_notebook(notebook)) as right:
+            vals = await self.__prepare(right, self._execute, self._execute_right, hold)
+
+        await run_cpu(_write_cache, vals, JPTestComparison.CACHE_DIR, path)
+        return vals
+
+    async def _cached_hold_right(self, notebook: Union[str, PathLike], key: str, hold: List[str]) -> List[Any]:
+        """
+        receive values from the second notebook once per key
+
+        :param notebook: notebook path
+        :param key: cache key
+        :param hold: names to receive
+        :return: values
+        """
+        if key not in JPTestComparison.CACHE:
+            JPTestComparison.CACHE[key] = asyncio.ensure_future(self.__hold_right(notebook, key, hold))
+
+        future = JPTestComparison.CACHE[key]
+
+        try:
+            return await future
+        except Exception:
+            # failed computations are retried by later tests
+            if JPTestComparison.CACHE.get(key) is future:
+                del JPTestComparison.CACHE[key]
+            raise
+
     async def execute(self, notebook: Union[str, PathLike]):
-        async with \
-                self._start(notebook) as left, \
-                self._start(notebook) as right:
-            # hold
-            hold_left = self._hold_left if isinstance(self._hold_left, list) else [self._hold_left]
-            hold_right = self._hold_right if isinstance(self._hold_right, list) else [self._hold_right]
+        # hold
+        hold_left = self._hold_left if isinstance(self._hold_left, list) else [self._hold_left]
+        hold_right = self._hold_right if isinstance(self._hold_right, list) else [self._hold_right]
 
+        # cached values from the second notebook
+        try:
+            key = await self._cache_key(notebook, hold_right)
+        except Exception as e:
+            return 0, [str(e)], e
+
+        if key is not None:
+            async with self._start(await read_notebook(notebook)) as left:
+                try:
+                    result = await asyncio.gather(*[
+                        self.__prepare(left, self._execute, self._execute_left, hold_left),
+                        self._cached_hold_right(notebook, key, hold_right)
+                    ])
+
+                    fun = self._fun(*result[0], *result[1])
+                    return *(await self._execute_fun(fun)), None
+                except Exception as e:
+                    return 0, [str(e)], e
+
+        async with \
+                self._start(await read_notebook(notebook)) as left, \
+                self._start(await read_notebook(notebook)) as right:
             # prepare and hold
             try:
                 result = await asyncio.gather(*[
@@ -3,6 +3,7 @@ from os import PathLike
 from typing import Union, List
 
 from .JPTest import JPTest, EXECUTE_TYPE
+from .notebook.util import read_notebook
 
 
 class JPTestGet(JPTest):
@@ -16,7 +17,7 @@ class JPTestGet(JPTest):
         self._get: List[str] = get if isinstance(get, list) else [get]
 
     async def execute(self, notebook: Union[str, PathLike]):
-        async with self._start(notebook) as nb:
+        async with self._start(await read_notebook(notebook)) as nb:
             try:
                 if self._execute is not None:
                     await self._execute_recursively(nb, self._execute)
@@ -1,20 +1,27 @@
+from contextlib import AsyncExitStack
+
 from . import *
 
 
 @JPTest('run')
 async def run(nb: Notebook):
-    # iterate over cells
-    for cell in nb.cells:
-        # find `jp:input` tag
-        if 'jp:input' in cell.tags:
-            # replace input function
-            def replacement(arg):
-                return arg
+    # replace input function
+    def replacement(arg):
+        return arg
 
-            # execute cell
-            async with nb.replace_fun('input', replacement):
-                await cell.execute()
+    # the stack restores `input` even if a cell fails
+    async with AsyncExitStack() as stack:
+        patched = False
 
-        # execute cell normally
-        else:
+        # iterate over cells
+        for cell in nb.cells:
+            # find `jp:input` tag and patch consecutive input cells only once
+            if 'jp:input' in cell.tags and not patched:
+                await stack.enter_async_context(nb.patch({'input': replacement}))
+                patched = True
+            elif 'jp:input' not in cell.tags and patched:
+                await stack.aclose()
+                patched = False
+
+            # execute cell
             await cell.execute()
@@ -1,6 +1,9 @@
+from .JPDataset import JPDataset
+from .JPFixture import JPFixture
 from .JPSetup import JPSetup, JPTeardown
 from .JPTest import JPTest
 from .JPTestComparison import JPTestComparison
 from .JPTestGet import JPTestGet
-from .notebook import Notebook, NotebookReference
+from .notebook import Notebook, NotebookGroup, NotebookReference, Payload, digest
 from .notebook.kernels import *
+from .notebook.util import run_cpu
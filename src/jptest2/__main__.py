@@ -1,16 +1,19 @@
 import argparse
 import asyncio
 import importlib.util
+import inspect
 import json
 import os
 import sys
 import traceback
 from argparse import ArgumentParser
 from asyncio import Semaphore
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import reduce
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 
-from jptest2 import JPTest, JPSetup, JPTeardown
+from jptest2 import JPTest, JPTestComparison, JPDataset, JPFixture, JPSetup, JPTeardown, ZygoteKernelProvider
+from jptest2.notebook import util
 
 
 async def test(args: argparse.Namespace):
@@ -19,9 +22,31 @@ async def test(args: argparse.Namespace):
 
     # reset registered tests and other functions
     JPTest.TESTS = {}
+    JPTest.TEMPLATES = {}
+    JPTest.SHARED = {}
+    JPTest.SHARED_USERS = {}
+    JPTestComparison.CACHE = {}
+    JPDataset.DATASETS = {}
+    JPFixture.FIXTURES = []
     JPSetup.FN = []
     JPTeardown.FN = []
 
+    # executor for deserialization, notebook parsing and `run_cpu`
+    if args.cpu_processes:
+        util.set_cpu_executor(ProcessPoolExecutor(max_workers=args.cpu_workers))
+    elif args.cpu_workers is not None:
+        util.set_cpu_executor(ThreadPoolExecutor(max_workers=args.cpu_workers, thread_name_prefix='jptest_cpu'))
+
+    # store values received from sample solutions
+    JPTestComparison.CACHE_DIR = args.cache
+
+    # fork kernels from a zygote
+    if args.zygote or args.preload is not None:
+        preload = args.preload.split(',') if args.preload else []
+        JPTest.KERNEL_PROVIDER = ZygoteKernelProvider(preload)
+    else:
+        JPTest.KERNEL_PROVIDER = None
+
     # load classes from file
     if args.test_file is not None:
         spec = importlib.util.spec_from_file_location('testfile', args.test_file)
@@ -32,6 +57,12 @@ async def test(args: argparse.Namespace):
         # noinspection PyUnresolvedReferences
         import jptest2.RunTest
 
+    # load shared datasets
+    if args.verbose:
+        print('load datasets', file=sys.stderr)
+
+    await JPDataset.prepare()
+
     # pre run functions
     if args.verbose:
         print('pre run', file=sys.stderr)
@@ -44,33 +75,67 @@ async def test(args: argparse.Namespace):
 
     async def exec_test(test: JPTest):
         async with proc:
-            return test.max_score, *await test.execute(args.nb_file)
-
-    async def exec_list(name: str, tests: List[JPTest]):
-        rs = await asyncio.gather(*[exec_test(test) for test in tests])
-        return name, *reduce(
-            lambda acc, row: (
-                acc[0] + row[0],
-                acc[1] + row[1],
-                acc[2] + list(set(row[2]) - set(acc[2])),
-                acc[3] + [row[3]]
-            ),
-            rs,
-            (0, 0, [], [])
-        )
-
-    results: List[Tuple[str, float, float, List[str], List[Exception]]] = await asyncio.gather(*[
-        exec_list(name, tests)
-        for name, tests in JPTest.TESTS.items()
-        if args.test_name is None or args.test_name == name
-    ])
+            return await test.execute_cases(args.nb_file)
+
+    async def exec_list(tests: List[JPTest]):
+        # parametrized tests return one row per case, rows with the same name are combined
+        rows: Dict[str, list] = {}
+        for case_rows in await asyncio.gather(*[exec_test(test) for test in tests]):
+            for name, *row in case_rows:
+                rows.setdefault(name, []).append(row)
+
+        return [
+            (name, *reduce(
+                lambda acc, row: (
+                    acc[0] + row[0],
+                    acc[1] + row[1],
+                    acc[2] + list(set(row[2]) - set(acc[2])),
+                    acc[3] + [row[3]]
+                ),
+                rs,
+                (0, 0, [], [])
+            ))
+            for name, rs in rows.items()
+        ]
+
+    results: List[Tuple[str, float, float, List[str], List[Exception]]] = [
+        row
+        for rows in await asyncio.gather(*[
+            exec_list(tests)
+            for name, tests in JPTest.TESTS.items()
+            if args.test_name is None or args.test_name == name
+        ])
+        for row in rows
+    ]
 
     # post run functions
     if args.verbose:
         print('post run', file=sys.stderr)
 
-    if len(JPTeardown.FN) > 0:
-        await asyncio.gather(*[f() for f in JPTeardown.FN])
+    async def close_kernel_provider():
+        if JPTest.KERNEL_PROVIDER is not None:
+            await JPTest.KERNEL_PROVIDER.close()
+
+    # run every cleanup step even if a previous one fails
+    cleanup_errors = []
+
+    for step in (
+            lambda: asyncio.gather(*[f() for f in JPTeardown.FN]),
+            JPFixture.close_all,
+            JPTest.close_shared,
+            close_kernel_provider,
+            JPTest.remove_templates,
+            JPDataset.remove_cache
+    ):
+        try:
+            result = step()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            cleanup_errors.append(e)
+
+    if len(cleanup_errors) > 0:
+        raise cleanup_errors[0]
 
     # print output
     if args.quiet:  # quiet
@@ -135,6 +200,14 @@ async def main():
     parser.add_argument('--timeout', type=int, help='override default timeout in seconds (default 120s)', default=120)
     parser.add_argument('--quiet', action='store_true', help='only print exceptions')
     parser.add_argument('--verbose', '-v', action='store_true', help='print verbosely to stderr')
+    parser.add_argument('--zygote', action='store_true', help='fork kernels from a pre-initialized process (Linux)')
+    parser.add_argument('--preload', type=str, help='comma separated modules to import in the zygote', default=None)
+    parser.add_argument('--cache', type=str, help='directory to cache values held from sample solutions in',
+                        default=None)
+    parser.add_argument('--cpu-workers', type=int, help='number of workers for cpu bound work (default: cpu count)',
+                        default=None)
+    parser.add_argument('--cpu-processes', action='store_true',
+                        help='use processes instead of threads for `run_cpu` (transfers are not offloaded then)')
     parser.add_argument('--live', action='store_true', help='run infinitely and watch for changes')
 
     args = parser.parse_args()
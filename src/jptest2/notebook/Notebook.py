@@ -1,11 +1,11 @@
 from os import PathLike
-from typing import Callable, List, Union, Awaitable, Iterator
+from typing import Callable, List, Union, Awaitable, Iterator, Optional
 
 import nbformat
 from nbformat import NotebookNode
 from nbformat.v4 import new_code_cell
 
-from .NotebookCell import NotebookCell
+from .NotebookCell import NotebookCell, CellRowIterator
 
 
 class Notebook:
@@ -13,15 +13,21 @@ class Notebook:
     class for async interaction with notebooks
     """
 
-    def __init__(self, notebook: Union[str, PathLike], ce: Callable[[NotebookCell], Awaitable], execute: bool):
+    def __init__(self, notebook: Union[str, PathLike, NotebookNode], ce: Callable[[NotebookCell], Awaitable],
+                 execute: bool, ci: Optional[CellRowIterator] = None):
         """
-        :param notebook: notebook path
+        :param notebook: notebook path or an already parsed notebook
         :param execute: execute all cells in `__aenter__`
         :param execute: timeout per cell in seconds
+        :param ci: function streaming the result rows of a cell (see `NotebookCell.iter_rows`)
         """
-        self._nb: NotebookNode = nbformat.read(notebook, as_version=4)
+        if isinstance(notebook, NotebookNode):
+            self._nb: NotebookNode = notebook
+        else:
+            self._nb: NotebookNode = nbformat.read(notebook, as_version=4)
         self._ce: Callable[[NotebookCell], Awaitable] = ce
         self._execute: bool = execute
+        self._ci: Optional[CellRowIterator] = ci
 
     async def __aenter__(self) -> "Notebook":
         """
@@ -59,7 +65,7 @@ class Notebook:
         self._nb.cells.append(cell)
 
         # execute cell
-        nb_cell = NotebookCell(self._nb, self._ce, insert_index)
+        nb_cell = NotebookCell(self._nb, self._ce, insert_index, self._ci)
         await nb_cell.execute()
 
         # parse output
@@ -72,7 +78,7 @@ class Notebook:
 
         :return: list of NotebookCell
         """
-        return [NotebookCell(self._nb, self._ce, i) for i in range(len(self._nb.cells))]
+        return [NotebookCell(self._nb, self._ce, i, self._ci) for i in range(len(self._nb.cells))]
 
     def iter_code_cells(self, *tag: str, from_tag: str = None, to_tag: str = None) -> Iterator[NotebookCell]:
         """
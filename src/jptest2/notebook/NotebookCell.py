@@ -1,8 +1,11 @@
-from typing import List, Tuple, Union, Dict, Callable, Awaitable
+from typing import List, Tuple, Union, Dict, Callable, Awaitable, Optional, AsyncIterator
 
 from nbformat import NotebookNode
 
 from .NotebookError import NotebookError
+from .QueryProfile import QueryProfile
+
+CellRowIterator = Callable[["NotebookCell", int, Optional[int]], AsyncIterator[List[Tuple]]]
 
 
 class NotebookCell:
@@ -11,11 +14,14 @@ class NotebookCell:
     # CELL_ERROR = Union[Tuple[str, str, List], None]
     CELL_EXECUTION_RESULT = Tuple[CELL_DATA, CELL_STREAM, CELL_STREAM, CELL_DATA]
 
-    def __init__(self, nb: NotebookNode, ce: Callable[["NotebookCell"], Awaitable], idx: int):
+    def __init__(self, nb: NotebookNode, ce: Callable[["NotebookCell"], Awaitable], idx: int,
+                 ci: Optional[CellRowIterator] = None):
         self._nb: NotebookNode = nb
         self._ce: Callable[[NotebookCell], Awaitable] = ce
+        self._ci: Optional[CellRowIterator] = ci
         self.idx: int = idx
         self.last_execution_result = None
+        self.profiles: Optional[List[QueryProfile]] = None
 
     @property
     def raw_cell(self) -> NotebookNode:
@@ -46,6 +52,18 @@ class NotebookCell:
     def source(self) -> str:
         return self.raw_cell['source']
 
+    @property
+    def execution_time(self) -> Optional[float]:
+        """
+        total execution time of all statements in seconds (sql kernels only)
+
+        :return: time or None if not available
+        """
+        if self.profiles is None:
+            return None
+
+        return sum(p.time for p in self.profiles)
+
     async def execute(self) -> "NotebookCell":
         """
         execute this cell in notebook context
@@ -55,6 +73,36 @@ class NotebookCell:
         self.last_execution_result = await self._ce(self)
         return self
 
+    @property
+    def _kernel_name(self) -> str:
+        """
+        name of the notebook class executing this cell or the kernel in the notebook metadata
+        """
+        if hasattr(self._ce, '__self__'):
+            return type(self._ce.__self__).__name__
+
+        return self._nb.metadata.get('kernelspec', {}).get('name', 'unknown')
+
+    def iter_rows(self, batch_size: int = 1000, max_rows: Optional[int] = None) -> AsyncIterator[List[Tuple]]:
+        """
+        execute this cell in notebook context and stream the rows of its last statement in batches
+        (sql kernels only)
+
+        Rows are fetched from the database only when the next batch is requested. Leaving
+        the loop early or cancelling the task closes the result and lets the database drop
+        the remaining rows. Use `contextlib.aclosing` to close it immediately after `break`.
+
+        :param batch_size: maximum number of rows per batch
+        :param max_rows: stop after this many rows (default: all rows)
+        :return: async iterator of row lists
+        """
+        if self._ci is None:
+            raise AssertionError(f'kernel {self._kernel_name} does not support streaming rows')
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+
+        return self._ci(self, batch_size, max_rows)
+
     def output(self) -> CELL_EXECUTION_RESULT:
         """
         extract output data from a cell
@@ -33,111 +33,20 @@ class NotebookFunctionWrapper:
 
         :return: self
         """
-        # store backup
-        self._backup: NotebookReference = await self._nb.get(self._fun_name)
-
-        # inject tracker and store reference
-        class_name = randomize_name('Track')
+        # replace function with tracker, the original function is kept in `fun`
         wrapper_name = randomize_name('track')
 
         await self._nb.execute_code(f'''
-            class {class_name}:
-                def __init__(self, fun):
-                    # store properties
-                    self._include_parameters = {self._parameters}
-                    self._include_all_parameters = {self._all_parameters}
-                    self._include_return_values = {self._return_values}
-            
-                    # analyse `fun`
-                    self.fun = fun
-            
-                    self._fun_default_values = {{}}
-                    self._fun_positions = []
-                    self._fun_names = set()
-                    self._fun_var_positional = None
-                    self._fun_var_keyword = None
-            
-                    import inspect
-                    from inspect import Signature, Parameter
-                    signature: Signature = inspect.signature(fun)
-            
-                    for index, param in enumerate(signature.parameters.values()):
-                        if param.default is not Parameter.empty:
-                            self._fun_default_values[param.name] = param.default
-                        if param.kind == Parameter.POSITIONAL_OR_KEYWORD or param.kind == Parameter.POSITIONAL_ONLY:
-                            self._fun_positions.append(param.name)
-                        if param.kind == Parameter.POSITIONAL_OR_KEYWORD or param.kind == Parameter.KEYWORD_ONLY:
-                            self._fun_names.add(param.name)
-                        if param.kind == Parameter.VAR_POSITIONAL:
-                            self._fun_var_positional = index
-                            self._fun_positions.append(param.name)
-                        if param.kind == Parameter.VAR_KEYWORD:
-                            self._fun_var_keyword = param.name
-            
-                    # store calls array
-                    self.calls = []
-            
-                def __call__(self):
-                    def wrapper_fun(*args, **kwargs):
-                        call_params = {{}}
-            
-                        # extract args
-                        for i, val in enumerate(args):
-                            name = self._fun_positions[min(i, len(self._fun_positions) - 1)]
-        
-                            if self._fun_var_positional is not None and i >= self._fun_var_positional:
-                                if name not in call_params:
-                                    call_params[name] = []
-        
-                                call_params[name].append(val)
-        
-                            else:
-                                call_params[name] = val
-            
-                        # extract kwargs
-                        for name, val in kwargs.items():
-                            if name in self._fun_names:
-                                call_params[name] = val
-                            elif self._fun_var_keyword is not None:
-                                if self._fun_var_keyword not in call_params:
-                                    call_params[self._fun_var_keyword] = {{}}
-            
-                                call_params[self._fun_var_keyword][name] = val
-            
-                        # insert default values
-                        for name, val in self._fun_default_values.items():
-                            if name not in call_params:
-                                call_params[name] = val
-            
-                        # apply filter
-                        if not self._include_all_parameters:
-                            for key in list(call_params):
-                                print(key, self._include_parameters)
-                                if key not in self._include_parameters:
-                                    del call_params[key]
-            
-                        # get result
-                        result = self.fun(*args, **kwargs)
-            
-                        # append output
-                        if self._include_return_values:
-                            self.calls.append((call_params, result))
-                        else:
-                            self.calls.append((call_params, None))
-            
-                        # return fun result
-                        return result
-            
-                    return wrapper_fun
-            
-                def clear(self):
-                    self.calls = []
-            
-            {wrapper_name} = {class_name}({self._fun_name})
+            {wrapper_name} = __import__('_jptest').Tracker(
+                {self._fun_name},
+                {self._parameters!r}, {self._all_parameters}, {self._return_values}
+            )
             {self._fun_name} = {wrapper_name}()
         ''')
 
-        self._wrapper: NotebookReference = self._nb.ref(wrapper_name)
+        # the tracker is deleted with this object, calls can be received after `__aexit__`
+        self._wrapper: NotebookReference = self._nb._owned_ref(wrapper_name)
+        self._backup: NotebookReference = self._wrapper.fun
 
         return self
 
@@ -151,7 +60,7 @@ class NotebookFunctionWrapper:
         :return:
         """
         await self._nb.execute_code(f'''
-            {self._fun_name} = {self._backup.name}
+            {self._fun_name} = {await self._backup._resolve()}
         ''')
 
     async def clear(self):
@@ -0,0 +1,180 @@
+import asyncio
+from typing import List, Callable, Awaitable, Any, Tuple, TypeVar, Iterable, Optional, Dict
+
+from . import Notebook
+
+T = TypeVar('T')
+
+
+class NotebookGroup:
+    """
+    distributes calls over multiple identically prepared notebooks
+    """
+
+    def __init__(self, notebooks: List[Notebook]):
+        """
+        :param notebooks: list of notebooks (replicas)
+        """
+        self.notebooks: List[Notebook] = notebooks
+        self._load: List[int] = [0] * len(notebooks)
+
+    async def __aenter__(self) -> "NotebookGroup":
+        """
+        start all replicas in parallel
+
+        :return: self
+        """
+        results = await asyncio.gather(*[nb.__aenter__() for nb in self.notebooks], return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+
+        # stop the replicas that did start if any failed
+        if len(errors) > 0:
+            e = errors[0]
+            await asyncio.gather(*[
+                nb.__aexit__(type(e), e, e.__traceback__)
+                for nb, result in zip(self.notebooks, results)
+                if not isinstance(result, BaseException)
+            ], return_exceptions=True)
+
+            raise e
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        stop all replicas
+
+        :param exc_type:
+        :param exc_val:
+        :param exc_tb:
+        """
+        await asyncio.gather(*[nb.__aexit__(exc_type, exc_val, exc_tb) for nb in self.notebooks])
+
+    def __len__(self) -> int:
+        return len(self.notebooks)
+
+    async def run(self, fun: Callable[[Notebook], Awaitable[T]]) -> T:
+        """
+        execute a function with the replica that has the least pending operations
+
+        :param fun: async function receiving a notebook
+        :return: return value of `fun`
+        """
+        index = min(range(len(self.notebooks)), key=lambda i: self._load[i])
+        self._load[index] += 1
+
+        try:
+            return await fun(self.notebooks[index])
+        finally:
+            self._load[index] -= 1
+
+    async def execute_code(self, code: str) -> List[Any]:
+        """
+        execute code in all replicas
+
+        :param code: code string
+        :return: list of cells, one per replica
+        """
+        return await asyncio.gather(*[nb.execute_code(code) for nb in self.notebooks])
+
+    async def store(self, value: Any, name: str) -> "NotebookGroupReference":
+        """
+        store a value in all replicas, it is serialized only once
+
+        :param value: value or Payload
+        :param name: variable name
+        :return: NotebookGroupReference
+        """
+        await self.notebooks[0].broadcast(value, name, self.notebooks)
+        return self.ref(name)
+
+    def __getattr__(self, name: str) -> "NotebookGroupReference":
+        """
+        alias for `ref`
+
+        :param name: name of object
+        :return: NotebookGroupReference
+        """
+        return self.ref(name)
+
+    def ref(self, name: str) -> "NotebookGroupReference":
+        """
+        get a reference to an object that exists in all replicas
+
+        :param name: name of object
+        :return: NotebookGroupReference
+        """
+        return NotebookGroupReference(self, name)
+
+    def refs(self, *names: str) -> Tuple["NotebookGroupReference", ...]:
+        """
+        get multiple references to objects that exist in all replicas
+
+        :param names: list of names
+        :return: list of NotebookGroupReference
+        """
+        return tuple(self.ref(n) for n in names)
+
+
+class NotebookGroupReference:
+    """
+    represents an object present in every replica of a NotebookGroup
+    """
+
+    def __init__(self, group: NotebookGroup, name: str):
+        self._group: NotebookGroup = group
+        self._name: str = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def __getattr__(self, key: str) -> "NotebookGroupReference":
+        return NotebookGroupReference(self._group, f'{self._name}.{key}')
+
+    async def __call__(self, *args, **kwargs) -> Any:
+        """
+        call function in the least busy replica and receive the result
+
+        :param args:
+        :param kwargs:
+        :return: received return value
+        """
+        return await self._group.run(lambda nb: nb.ref(self._name)(*args, **kwargs).receive())
+
+    async def map(self, args_list: Iterable[Any], kwargs_list: Optional[Iterable[Dict[str, Any]]] = None,
+                  return_exceptions: bool = True, vectorize: bool = False) -> List[Any]:
+        """
+        split inputs into one chunk per replica and call `NotebookReference.map` with each
+
+        :param args_list: list of arguments
+        :param kwargs_list: list of keyword arguments (same length as `args_list`)
+        :param return_exceptions: return raised exceptions instead of raising the first one
+        :param vectorize: try to call the function once using a NumPy array of all inputs
+        :return: list of return values
+        """
+        args_list = list(args_list)
+        kwargs_list = list(kwargs_list) if kwargs_list is not None else None
+        size = max(1, -(-len(args_list) // len(self._group)))
+
+        chunks = await asyncio.gather(*[
+            self._group.run(lambda nb, i=i: nb.ref(self._name).map(
+                args_list[i:i + size],
+                kwargs_list[i:i + size] if kwargs_list is not None else None,
+                return_exceptions, vectorize
+            ))
+            for i in range(0, len(args_list), size)
+        ])
+
+        return [result for chunk in chunks for result in chunk]
+
+    async def receive(self) -> Any:
+        """
+        receive referenced object from the least busy replica
+
+        :return: value
+        """
+        return await self._group.run(lambda nb: nb.ref(self._name).receive())
+
+    def __await__(self):
+        return self.receive().__await__()
@@ -0,0 +1,72 @@
+import pickle
+from types import FunctionType
+from typing import Dict, Any, List
+
+from . import Notebook
+from .NotebookReference import NotebookReference
+from .util import randomize_name, function_source
+
+
+class NotebookPatch:
+    """
+    replaces functions and other objects in the notebook context and restores them on exit
+    """
+
+    def __init__(self, nb: Notebook, replacements: Dict[str, Any]):
+        """
+        :param nb:
+        :param replacements: dotted names like `input`, `time.sleep` or `Test.fun` and their replacements,
+                             functions are defined in the notebook context, references are resolved and
+                             other values are transferred
+        """
+        self._nb: Notebook = nb
+        self._replacements: Dict[str, Any] = replacements
+        self._stored: List[NotebookReference] = []
+
+    async def _encode(self, value: Any) -> str:
+        # define functions from source so they use the notebook's globals
+        if isinstance(value, FunctionType):
+            source, name = function_source(value)
+            return f"__import__('_jptest').define({source!r}, {name!r}, globals())"
+
+        if isinstance(value, NotebookReference):
+            if not value.is_from(self._nb):
+                value = await self._nb.store(value)
+                self._stored.append(value)
+
+            return await value._resolve()
+
+        return await self._nb._literal(pickle.dumps(value))
+
+    async def __aenter__(self) -> "NotebookPatch":
+        """
+        apply all replacements
+
+        :return: self
+        """
+        self._undo: NotebookReference = self._nb.ref(randomize_name('patch'))
+
+        items = [f'{path!r}: {await self._encode(value)}' for path, value in self._replacements.items()]
+        items_str = ',\n                '.join(items)
+
+        await self._nb.execute_code(f'''
+            {self._undo.name} = __import__('_jptest').patch(globals(), {{
+                {items_str}
+            }})
+        ''')
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        restore replaced objects
+
+        :param exc_type:
+        :param exc_val:
+        :param exc_tb:
+        :return:
+        """
+        await self._nb.execute_code(f'''
+            __import__('_jptest').unpatch({self._undo.name})
+            del {self._undo.name}
+        ''')
@@ -1,10 +1,13 @@
 import asyncio
-import base64
 import pickle
-from typing import Any, Union
+import time
+from types import FunctionType
+from typing import Any, Union, Iterable, Optional, Dict, List, Callable
 
 from . import Notebook, NotebookCell
-from .util import randomize_name
+from .PropertyCheck import PropertyCheck
+from .ValueComparison import ValueComparison
+from .util import randomize_name, offload, function_source
 
 
 class NotebookReference:
@@ -45,9 +48,12 @@ class NotebookReference:
         """
         if name is None:
             name = randomize_name(self.name)
+            ref = self._nb._owned_ref
+        else:
+            ref = self._nb.ref
 
         await self._nb.execute_code(f'{name} = {await self._resolve()}')
-        return NotebookReference(self._nb, name)
+        return ref(name)
 
     def __getitem__(self, key) -> "NotebookItemReference":
         return NotebookItemReference(self, key)
@@ -73,16 +79,122 @@ class NotebookReference:
         """
         return await self._nb.ref(f'len({await self._resolve()})').receive()
 
+    async def map(self, args_list: Iterable[Any], kwargs_list: Optional[Iterable[Dict[str, Any]]] = None,
+                  return_exceptions: bool = True, vectorize: bool = False) -> List[Any]:
+        """
+        call referenced function with many inputs in a single round-trip.
+        Tuples in `args_list` are used as positional arguments, other values as single argument.
+
+        :param args_list: list of arguments
+        :param kwargs_list: list of keyword arguments (same length as `args_list`)
+        :param return_exceptions: return raised exceptions instead of raising the first one
+        :param vectorize: try to call the function once using a NumPy array of all inputs
+        :return: list of return values
+        """
+        args_list = list(args_list)
+        kwargs_list = list(kwargs_list) if kwargs_list is not None else None
+        inputs = pickle.dumps((args_list, kwargs_list))
+
+        return await self._nb.ref(f'''__import__('_jptest').map(
+                {await self._resolve()},
+                *{await self._nb._literal(inputs)},
+                {return_exceptions},
+                {vectorize}
+            )''').receive()
+
+    async def matches(self, expected: Any, rtol: float = 1e-05, atol: float = 1e-08, check_order: bool = True,
+                      sample: int = 5) -> ValueComparison:
+        """
+        compare referenced object with an expected value inside the notebook context
+        so that only the result is transferred. Local values are stored once per notebook
+        and reused by later comparisons. Frames and arrays are compared using pandas
+        and NumPy, numbers using the given tolerances and other values using `==`.
+
+        :param expected: expected value or reference
+        :param rtol: relative tolerance for numbers
+        :param atol: absolute tolerance for numbers
+        :param check_order: compare rows of frames and arrays and items of lists in order
+        :param sample: maximum number of differing values to describe
+        :return: ValueComparison
+        """
+        if isinstance(expected, NotebookReference) and expected.is_from(self._nb):
+            expected_ref = expected
+        elif isinstance(expected, NotebookReference):
+            expected_ref = await self._nb.store(expected)
+        else:
+            expected_ref = await self._nb.store_once(expected)
+
+        actual, expected = await asyncio.gather(self._resolve(), expected_ref._resolve())
+
+        equal, message = await self._nb.ref(f'''__import__('_jptest').matches(
+                {actual},
+                {expected},
+                {rtol!r}, {atol!r}, {check_order}, {sample}
+            )''').receive()
+
+        return ValueComparison(equal, message)
+
+    async def check(self, reference: Union[Callable, "NotebookReference"],
+                    generator: Union[Callable, "NotebookReference"], cases: int = 1000, seed: int = 0,
+                    vectorize: bool = False, rtol: float = 1e-05, atol: float = 1e-08,
+                    examples: int = 3) -> PropertyCheck:
+        """
+        compare referenced function with a reference implementation on generated inputs
+        inside the notebook context so that only the smallest failing inputs are transferred.
+        Both functions are called with the same arguments and must return matching values
+        or raise the same exception type.
+
+        :param reference: reference implementation, local functions are defined in the notebook context
+        :param generator: function receiving a `random.Random` and returning a tuple of arguments or a single argument,
+                          local functions are defined in the notebook context
+        :param cases: number of inputs to generate
+        :param seed: seed of the random number generator, so every run checks the same inputs
+        :param vectorize: try to call both functions once using NumPy arrays of all inputs
+        :param rtol: relative tolerance for numbers
+        :param atol: absolute tolerance for numbers
+        :param examples: maximum number of failing inputs to receive
+        :return: PropertyCheck
+        """
+        stored = []
+
+        async def encode(fun: Union[Callable, NotebookReference]) -> str:
+            if isinstance(fun, FunctionType):
+                source, name = function_source(fun)
+                return f"__import__('_jptest').define({source!r}, {name!r}, globals())"
+
+            if not fun.is_from(self._nb):
+                fun = await self._nb.store(fun)
+                stored.append(fun)
+
+            return await fun._resolve()
+
+        fun, reference, generator = await asyncio.gather(self._resolve(), encode(reference), encode(generator))
+
+        result = await self._nb.ref(f'''__import__('_jptest').check(
+                {fun},
+                {reference},
+                {generator},
+                {int(cases)}, {seed!r}, {vectorize}, {rtol!r}, {atol!r}, {int(examples)}
+            )''').receive()
+
+        return PropertyCheck(*result)
+
+    async def digest(self) -> str:
+        """
+        calculate a content hash of referenced object in the notebook context.
+        It equals `jptest2.digest` applied to the received value.
+
+        :return: hex digest
+        """
+        return await self._nb.ref(f"__import__('_jptest').digest({await self._resolve()})").receive()
+
     async def execute(self) -> NotebookCell:
         """
         execute the underlying statement in the notebook context
 
         :return: inserted notebook cell
         """
-        return await self._nb.execute_code(f'''
-            import pickle
-            {await self._resolve()}
-        ''')
+        return await self._nb.execute_code(await self._resolve())
 
     @staticmethod
     async def execute_many(*references: "NotebookReference"):
@@ -94,20 +206,24 @@ class NotebookReference:
 
         :return: value
         """
+        start = time.perf_counter()
+
         result, o, e, p = (await self._nb.execute_code(f'''
-            import pickle, base64
-            base64.b64encode(pickle.dumps({await self._resolve()})).decode('ascii')
+            __import__('_jptest').encode(
+                {await self._resolve()},
+                {self._nb.COMPRESSION_THRESHOLD}, {self._nb._codecs!r}
+            )
         ''')).output()
 
         for mime, value in result:
             if mime != 'text/plain':
                 continue
 
-            value = base64.b64decode(value.encode('ascii'))
-
-            if deserialize:
-                value = pickle.loads(value)
+            codec, raw_bytes, transferred_bytes, value = await offload(
+                len(value), self._nb._decode, value, deserialize
+            )
 
+            self._nb.transfer_stats.add(codec, raw_bytes, transferred_bytes, time.perf_counter() - start)
             return value
 
     def __await__(self):
@@ -132,7 +248,7 @@ class NotebookItemReference(NotebookReference):
             self._encode()
         )
 
-        return f'{val}[pickle.loads({key})]'
+        return f"{val}[__import__('pickle').loads({key})]"
 
 
 class NotebookAttributeReference(NotebookReference):
@@ -150,15 +266,18 @@ class NotebookCallReference(NotebookReference):
         super().__init__(parent)
         self._args = args
         self._kwargs = kwargs
+        self._stored: List[NotebookReference] = []
 
     async def _encode_arg(self, arg) -> str:
         # transfer references if not from same notebook
         if isinstance(arg, NotebookReference):
             if not arg.is_from(self._nb):
+                # keep transferred values alive as long as this call may be resolved
                 arg = await self._nb.store(arg)
-        # store local values in notebook
+                self._stored.append(arg)
+        # embed local values
         else:
-            arg = await self._nb.store(arg)
+            return await self._nb._literal(pickle.dumps(arg))
 
         return await arg._resolve()
 
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import pickle
+import tempfile
+import weakref
+from typing import Any, Optional
+
+from .util import offload, OFFLOAD_THRESHOLD
+
+
+def _dump(value: Any, path: str):
+    with open(path, 'wb') as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class Payload:
+    """
+    value that is serialized only once and can be stored in any number of notebooks
+    """
+
+    def __init__(self, value: Any):
+        """
+        :param value: value to store, must not be modified afterwards
+        """
+        self.value: Any = value
+        self._path: Optional['asyncio.Future[str]'] = None
+
+    async def __dump(self, directory: str) -> str:
+        fd, path = tempfile.mkstemp(prefix='jptest_', suffix='.pickle', dir=directory)
+        os.close(fd)
+
+        # the file is removed when this object is garbage collected or the interpreter exits
+        weakref.finalize(self, _remove, path)
+
+        # the size is unknown before pickling, so large values are assumed
+        await offload(OFFLOAD_THRESHOLD, _dump, self.value, path)
+        return path
+
+    async def path(self, directory: str) -> str:
+        """
+        pickle the value to a file on first use
+
+        :param directory: directory to create the file in, used on first call only
+        :return: file path
+        """
+        if self._path is None:
+            self._path = asyncio.ensure_future(self.__dump(directory))
+
+        return await self._path
+
+    def remove(self):
+        """
+        delete the file, the value is pickled again if stored afterwards
+        """
+        if self._path is not None and self._path.done() and self._path.exception() is None:
+            _remove(self._path.result())
+
+        self._path = None
@@ -0,0 +1,39 @@
+from typing import List, Tuple
+
+
+class PropertyCheck:
+    """
+    result of a comparison with a reference implementation using generated inputs
+    """
+
+    def __init__(self, cases: int, failed: int, examples: List[Tuple[Tuple, str]]):
+        """
+        :param cases: number of checked inputs
+        :param failed: number of inputs the function and the reference disagree on
+        :param examples: smallest failing arguments and a short description of each difference
+        """
+        self.cases: int = cases
+        self.failed: int = failed
+        self.examples: List[Tuple[Tuple, str]] = examples
+
+    @property
+    def passed(self) -> bool:
+        """
+        function and reference agree on all inputs
+
+        :return: True if no case failed
+        """
+        return self.failed == 0
+
+    def __bool__(self) -> bool:
+        return self.passed
+
+    def __str__(self) -> str:
+        if self.passed:
+            return f'{self.cases} cases passed'
+
+        examples = '\n'.join(f'  {args!r}: {message}' for args, message in self.examples)
+        return f'{self.failed} of {self.cases} cases failed, e.g.\n{examples}'
+
+    def __repr__(self) -> str:
+        return f'PropertyCheck(cases={self.cases!r}, failed={self.failed!r}, examples={self.examples!r})'
@@ -0,0 +1,35 @@
+from typing import List, Tuple, Optional
+
+
+class QueryComparison:
+    """
+    result of an order-insensitive comparison of two query results
+    """
+
+    def __init__(self, missing: List[Tuple], unexpected: List[Tuple], message: Optional[str] = None):
+        """
+        :param missing: sample of rows in the expected result but not in the actual result
+        :param unexpected: sample of rows in the actual result but not in the expected result
+        :param message: reason if the results can not be compared at all
+        """
+        self.missing: List[Tuple] = missing
+        self.unexpected: List[Tuple] = unexpected
+        self.message: Optional[str] = message
+
+    @property
+    def equal(self) -> bool:
+        """
+        both results contain the same rows with the same multiplicity
+
+        :return: True if equal
+        """
+        return self.message is None and len(self.missing) == 0 and len(self.unexpected) == 0
+
+    def __bool__(self) -> bool:
+        return self.equal
+
+    def __repr__(self) -> str:
+        if self.message is not None:
+            return f'QueryComparison(message={self.message!r})'
+
+        return f'QueryComparison(missing={self.missing!r}, unexpected={self.unexpected!r})'
@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+
+class QueryProfile:
+    """
+    execution time and (optionally) query plan of a single sql statement
+    """
+
+    def __init__(self, statement: str, time: float, plan: Optional[List[str]] = None,
+                 full_scans: Optional[List[str]] = None, cross_joins: int = 0, cost: Optional[float] = None):
+        """
+        :param statement: executed statement
+        :param time: execution time in seconds
+        :param plan: query plan, one line per operator indented by depth (None if not captured)
+        :param full_scans: names of tables scanned without using an index
+        :param cross_joins: number of joins producing the cartesian product of their inputs
+        :param cost: estimated plan cost in rows (None if the engine does not provide estimates)
+        """
+        self.statement: str = statement
+        self.time: float = time
+        self.plan: Optional[List[str]] = plan
+        self.full_scans: List[str] = full_scans if full_scans is not None else []
+        self.cross_joins: int = cross_joins
+        self.cost: Optional[float] = cost
+
+    def has_full_scan(self, table: Optional[str] = None) -> bool:
+        """
+        check if the plan scans a table without using an index
+
+        :param table: table name (default: any table)
+        :return: True if a full scan was found
+        """
+        if table is None:
+            return len(self.full_scans) > 0
+
+        return table.lower() in (t.lower() for t in self.full_scans)
+
+    @property
+    def has_cross_join(self) -> bool:
+        return self.cross_joins > 0
+
+    def problems(self, max_time: Optional[float] = None, max_cost: Optional[float] = None,
+                 full_scans: bool = True, cross_joins: bool = True) -> List[str]:
+        """
+        list reasons why this statement is inefficient
+
+        :param max_time: maximum execution time in seconds
+        :param max_cost: maximum estimated plan cost
+        :param full_scans: report tables scanned without index
+        :param cross_joins: report cross joins
+        :return: list of messages (empty if none)
+        """
+        result = []
+
+        if max_time is not None and self.time > max_time:
+            result.append(f'execution took {self.time:.3f}s (maximum {max_time}s)')
+        if max_cost is not None and self.cost is not None and self.cost > max_cost:
+            result.append(f'estimated cost {self.cost:g} exceeds {max_cost:g}')
+        if full_scans:
+            result.extend(f'full scan of table {t}' for t in self.full_scans)
+        if cross_joins and self.has_cross_join:
+            result.append(f'{self.cross_joins} cross join(s)')
+
+        return result
+
+    def __repr__(self) -> str:
+        return f'QueryProfile(time={self.time:.6f}, full_scans={self.full_scans!r}, ' \
+               f'cross_joins={self.cross_joins}, cost={self.cost!r})'
@@ -0,0 +1,42 @@
+from typing import Dict
+
+
+class TransferStats:
+    """
+    sizes and durations of values transferred between test context and notebook context
+    """
+
+    def __init__(self):
+        self.count: int = 0
+        self.raw_bytes: int = 0
+        self.transferred_bytes: int = 0
+        self.time: float = 0.0
+        self.codecs: Dict[str, int] = {}
+
+    def add(self, codec: str, raw_bytes: int, transferred_bytes: int, time: float):
+        """
+        record a single transfer
+
+        :param codec: compression codec (`raw` if uncompressed)
+        :param raw_bytes: size of the pickled value
+        :param transferred_bytes: size after compression
+        :param time: duration in seconds
+        """
+        self.count += 1
+        self.raw_bytes += raw_bytes
+        self.transferred_bytes += transferred_bytes
+        self.time += time
+        self.codecs[codec] = self.codecs.get(codec, 0) + 1
+
+    @property
+    def ratio(self) -> float:
+        """
+        compression ratio of all transfers
+
+        :return: raw size divided by transferred size
+        """
+        return self.raw_bytes / self.transferred_bytes if self.transferred_bytes > 0 else 1.0
+
+    def __repr__(self) -> str:
+        return f'TransferStats(count={self.count}, raw_bytes={self.raw_bytes}, ' \
+               f'transferred_bytes={self.transferred_bytes}, time={self.time:.3f}, codecs={self.codecs!r})'
@@ -0,0 +1,24 @@
+from typing import Optional
+
+
+class ValueComparison:
+    """
+    result of a comparison executed inside the notebook context
+    """
+
+    def __init__(self, equal: bool, message: Optional[str] = None):
+        """
+        :param equal: True if both values match
+        :param message: short description of the differences
+        """
+        self.equal: bool = equal
+        self.message: Optional[str] = message
+
+    def __bool__(self) -> bool:
+        return self.equal
+
+    def __str__(self) -> str:
+        return 'values match' if self.equal else self.message or 'values differ'
+
+    def __repr__(self) -> str:
+        return f'ValueComparison(equal={self.equal!r}, message={self.message!r})'
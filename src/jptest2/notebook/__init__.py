@@ -1,6 +1,15 @@
 from .Notebook import Notebook
 from .NotebookCell import NotebookCell
 from .NotebookFunctionCall import NotebookFunctionCall
+from .NotebookPatch import NotebookPatch
 from .NotebookFunctionReplacement import NotebookFunctionReplacement
 from .NotebookFunctionWrapper import NotebookFunctionWrapper
+from .NotebookGroup import NotebookGroup
 from .NotebookReference import NotebookReference
+from .Payload import Payload
+from .PropertyCheck import PropertyCheck
+from .QueryComparison import QueryComparison
+from .QueryProfile import QueryProfile
+from .TransferStats import TransferStats
+from .ValueComparison import ValueComparison
+from .kernels.runtime import digest
@@ -1,31 +1,88 @@
 import asyncio
+import atexit
+import json
+import os
 import re
+import tempfile
+import time
+from asyncio import Lock
 from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Optional, Dict, Any, AsyncIterator
 
 import duckdb
 
 from .. import Notebook
 from ..NotebookCell import NotebookCell
+from ..QueryComparison import QueryComparison
+from ..QueryProfile import QueryProfile
+from ..util import strip_statement
 
 
 class DuckDBNotebook(Notebook):
-    def __init__(self, notebook: Union[str, PathLike], execute: bool = False, executor: ThreadPoolExecutor = None):
-        super().__init__(notebook, self.__execute_cell, execute)
+    EXECUTOR: Optional[ThreadPoolExecutor] = None
+    EXECUTOR_WORKERS: int = os.cpu_count() or 4
+    READER_BATCH_SIZE: int = 1_000_000
+
+    def __init__(self, notebook: Union[str, PathLike], execute: bool = False, executor: ThreadPoolExecutor = None,
+                 fetch: str = 'tuples', template: Optional[Union[str, PathLike]] = None, explain: bool = False):
+        """
+        :param notebook: notebook path
+        :param execute: execute all cells in `__aenter__`
+        :param executor: executor to run queries in (default: process-wide shared executor)
+        :param fetch: result format of the last statement per cell,
+                      `tuples` for a tuple of (column names, rows),
+                      `arrow` for a `pyarrow.Table` or
+                      `reader` for a streaming `pyarrow.RecordBatchReader`
+        :param template: database file (see `snapshot`) copied into memory in `__aenter__`
+        :param explain: capture the query plan of every statement in `NotebookCell.profiles`
+        """
+        super().__init__(notebook, self.__execute_cell, execute, self.__iter_rows)
+
+        if fetch not in ('tuples', 'arrow', 'reader'):
+            raise ValueError(f'unsupported fetch mode {fetch}')
 
         self.db: duckdb.DuckDBPyConnection
-        self.executor: ThreadPoolExecutor
+        self.executor: ThreadPoolExecutor = executor if executor is not None else self.shared_executor()
+        self.fetch: str = fetch
+        self.explain: bool = explain
+        self._template: Optional[Union[str, PathLike]] = template
+        self._lock: Lock = Lock()
+
+    @classmethod
+    def shared_executor(cls) -> ThreadPoolExecutor:
+        """
+        get the bounded executor shared by all instances
+
+        :return: ThreadPoolExecutor
+        """
+        if DuckDBNotebook.EXECUTOR is None:
+            DuckDBNotebook.EXECUTOR = ThreadPoolExecutor(max_workers=cls.EXECUTOR_WORKERS,
+                                                         thread_name_prefix='duckdb')
 
-        if executor is None:
-            self.executor = ThreadPoolExecutor(max_workers=1)
-        else:
-            self.executor = executor
+        return DuckDBNotebook.EXECUTOR
+
+    @classmethod
+    def shutdown_executor(cls):
+        """
+        wait for pending queries and stop the shared executor
+        """
+        if DuckDBNotebook.EXECUTOR is not None:
+            DuckDBNotebook.EXECUTOR.shutdown(wait=True)
+            DuckDBNotebook.EXECUTOR = None
 
     async def __aenter__(self) -> "Notebook":
         self.db: duckdb.DuckDBPyConnection = duckdb.connect(':memory:')
 
         self.db.__enter__()
+
+        if self._template is not None:
+            await self._execute_statements(
+                f"ATTACH '{self._escape(self._template)}' AS jptest_template (READ_ONLY)",
+                'COPY FROM DATABASE jptest_template TO memory',
+                'DETACH jptest_template'
+            )
+
         await super().__aenter__()
 
         return self
@@ -34,25 +91,200 @@ class DuckDBNotebook(Notebook):
         await super().__aexit__(exc_type, exc_val, exc_tb)
         self.db.__exit__(exc_type, exc_val, exc_tb)
 
-    def _execute_and_fetch(self, statement: str, fetch: bool) -> Tuple[List, List]:
+    @staticmethod
+    def _escape(path: Union[str, PathLike]) -> str:
+        return str(path).replace("'", "''")
+
+    async def _execute_statements(self, *statements: str):
+        async with self._lock:
+            for statement in statements:
+                await asyncio.get_event_loop().run_in_executor(
+                    self.executor,
+                    self._execute_and_fetch, statement, False
+                )
+
+    async def snapshot(self, path: Optional[Union[str, PathLike]] = None) -> str:
+        """
+        write the current database to a file that can be used as `template`
+
+        :param path: file path (default: new temporary file)
+        :return: file path
+        """
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix='jptest_'), 'template.db')
+
+        await self._execute_statements(
+            f"ATTACH '{self._escape(path)}' AS jptest_snapshot",
+            'COPY FROM DATABASE memory TO jptest_snapshot',
+            'DETACH jptest_snapshot'
+        )
+
+        return str(path)
+
+    def _fetch_tuples(self, statement: str) -> Tuple[List[str], List[Tuple]]:
         with self.db.cursor() as cursor:
             cursor.execute(statement)
+            return [c[0] for c in cursor.description], cursor.fetchall()
+
+    async def _query(self, statement: str) -> Tuple[List[str], List[Tuple]]:
+        async with self._lock:
+            return await asyncio.get_event_loop().run_in_executor(self.executor, self._fetch_tuples, statement)
+
+    async def compare_queries(self, query: str, expected: str, sample: int = 5) -> QueryComparison:
+        """
+        compare the results of two queries inside the database regardless of row order
+
+        :param query: query to check, e.g. the source of a cell
+        :param expected: query returning the expected result
+        :param sample: maximum number of differing rows to receive per direction
+        :return: QueryComparison
+        """
+        query, expected = strip_statement(query), strip_statement(expected)
+
+        query_columns, _ = await self._query(f'SELECT * FROM ({query}\n) LIMIT 0')
+        expected_columns, _ = await self._query(f'SELECT * FROM ({expected}\n) LIMIT 0')
+
+        if len(query_columns) != len(expected_columns):
+            return QueryComparison([], [], f'expected {len(expected_columns)} columns, got {len(query_columns)}')
+
+        async def difference(left: str, right: str) -> List[Tuple]:
+            _, rows = await self._query(f'''
+                WITH jptest_left AS ({left}
+                ), jptest_right AS ({right}
+                )
+                SELECT * FROM (SELECT * FROM jptest_left EXCEPT ALL SELECT * FROM jptest_right)
+                LIMIT {int(sample)}
+            ''')
+            return rows
+
+        return QueryComparison(await difference(expected, query), await difference(query, expected))
+
+    def _execute_and_fetch(self, statement: str, fetch: bool) \
+            -> Union[Tuple[List, List], 'pyarrow.Table', 'pyarrow.RecordBatchReader', None]:
+        cursor = self.db.cursor()
+
+        # readers keep the result open until consumed
+        if fetch and self.fetch == 'reader':
+            cursor.execute(statement)
+            if hasattr(cursor, 'to_arrow_reader'):
+                return cursor.to_arrow_reader(self.READER_BATCH_SIZE)
+            else:
+                return cursor.fetch_record_batch(self.READER_BATCH_SIZE)
+
+        with cursor:
+            cursor.execute(statement)
+
+            if fetch and self.fetch == 'arrow':
+                if hasattr(cursor, 'to_arrow_table'):
+                    return cursor.to_arrow_table()
+                else:
+                    return cursor.fetch_arrow_table()
 
             if fetch:
                 return [c[0] for c in cursor.description], cursor.fetchall()
 
+    def _explain(self, statement: str) -> Dict:
+        """
+        get the estimated query plan of a statement without executing it
+
+        :param statement: sql statement
+        :return: keyword arguments for QueryProfile
+        """
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {statement}')
+                nodes = json.loads(cursor.fetchall()[-1][-1])
+        except (duckdb.Error, ValueError, IndexError):
+            return {}
+
+        plan, full_scans = [], []
+        cross_joins, cost = 0, 0.0
+
+        def visit(node: Dict, depth: int):
+            nonlocal cross_joins, cost
+
+            name = node.get('name', '').strip()
+            info = node.get('extra_info', {})
+            table = info['Table'].split('.')[-1] if 'Table' in info else None
+            plan.append('  ' * depth + name + (f' {table}' if table is not None else ''))
+
+            if name == 'SEQ_SCAN' and table is not None:
+                full_scans.append(table)
+            if name == 'CROSS_PRODUCT':
+                cross_joins += 1
+            if 'Estimated Cardinality' in info:
+                cost += float(info['Estimated Cardinality'])
+
+            for child in node.get('children', []):
+                visit(child, depth + 1)
+
+        for n in nodes:
+            visit(n, 0)
+
+        return {'plan': plan, 'full_scans': full_scans, 'cross_joins': cross_joins, 'cost': cost}
+
+    def _profile_and_fetch(self, statement: str, fetch: bool) -> Tuple[QueryProfile, Any]:
+        plan = self._explain(statement) if self.explain else {}
+
+        start = time.perf_counter()
+        result = self._execute_and_fetch(statement, fetch)
+
+        return QueryProfile(statement.strip(), time.perf_counter() - start, **plan), result
+
+    @staticmethod
+    def _statements(cell: NotebookCell) -> List[str]:
+        return list(filter(lambda x: x.strip(), re.split(r';$', cell.source, flags=re.MULTILINE)))
+
     async def __execute_cell(self, cell: NotebookCell):
-        statements = list(filter(lambda x: x.strip(), re.split(r';$', cell.source, flags=re.MULTILINE)))
+        statements = self._statements(cell)
         last_index = len(statements) - 1
 
-        for i, statement in enumerate(statements):
-            if i == last_index:
-                return await asyncio.get_event_loop().run_in_executor(
-                    self.executor,
-                    self._execute_and_fetch, statement, True
-                )
-            else:
-                await asyncio.get_event_loop().run_in_executor(
+        result = None
+        cell.profiles = []
+
+        async with self._lock:
+            for i, statement in enumerate(statements):
+                profile, result = await asyncio.get_event_loop().run_in_executor(
                     self.executor,
-                    self._execute_and_fetch, statement, False
+                    self._profile_and_fetch, statement, i == last_index
                 )
+                cell.profiles.append(profile)
+
+        return result
+
+    async def __iter_rows(self, cell: NotebookCell, batch_size: int,
+                          max_rows: Optional[int]) -> AsyncIterator[List[Tuple]]:
+        statements = self._statements(cell)
+        if len(statements) == 0:
+            return
+
+        loop = asyncio.get_event_loop()
+        cursor = self.db.cursor()
+        remaining = max_rows
+
+        try:
+            # results are streamed, so the lock is only needed until the last statement is started
+            async with self._lock:
+                for statement in statements[:-1]:
+                    await loop.run_in_executor(self.executor, self._execute_and_fetch, statement, False)
+
+                await loop.run_in_executor(self.executor, cursor.execute, statements[-1])
+
+            while remaining is None or remaining > 0:
+                size = batch_size if remaining is None else min(batch_size, remaining)
+                rows = await loop.run_in_executor(self.executor, cursor.fetchmany, size)
+                if len(rows) == 0:
+                    break
+
+                if remaining is not None:
+                    remaining -= len(rows)
+
+                yield rows
+        except asyncio.CancelledError:
+            cursor.interrupt()
+            raise
+        finally:
+            await loop.run_in_executor(self.executor, cursor.close)
+
+
+atexit.register(DuckDBNotebook.shutdown_executor)
@@ -1,26 +1,79 @@
+import ast
 import asyncio
+import base64
+import copy
+import hashlib
+import os
 import pickle
+import tempfile
+import time
+import weakref
 from asyncio import Lock
+from contextlib import asynccontextmanager
 from inspect import getsource
 from os import PathLike
-from typing import Callable, Tuple, Union, Optional, Any
+from typing import Callable, Tuple, Union, Optional, Any, Dict, List, AsyncIterator
 
 from nbclient import NotebookClient
 
 from .. import Notebook
 from ..NotebookCell import NotebookCell
+from ..NotebookError import NotebookError
 from ..NotebookFunctionReplacement import NotebookFunctionReplacement
 from ..NotebookFunctionWrapper import NotebookFunctionWrapper
+from ..NotebookPatch import NotebookPatch
 from ..NotebookReference import NotebookReference
-from ..util import randomize_name
+from ..Payload import Payload
+from ..TransferStats import TransferStats
+from ..util import randomize_name, offload, function_source
+from . import runtime
+from .ZygoteKernelProvider import ZygoteKernelProvider, ZYGOTE_SCRIPT
+
+
+RUNTIME_SCRIPT = os.path.join(os.path.dirname(__file__), 'runtime.py')
+RUNTIME_BOOTSTRAP = '''
+import importlib.util, sys
+if '_jptest' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('_jptest', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules['_jptest'] = module
+'''
 
 
 class PythonNotebook(Notebook):
-    def __init__(self, notebook: Union[str, PathLike], execute: bool = False, timeout: int = 120):
+    DIRECT_TRANSFER: bool = True
+    COMPRESSION_THRESHOLD: int = 64 * 1024
+    TRANSFER_DIR: Optional[str] = None
+    UNKNOWN_NAMESPACE: str = '?'
+
+    def __init__(self, notebook: Union[str, PathLike], execute: bool = False, timeout: int = 120,
+                 kernel_provider: Optional[ZygoteKernelProvider] = None, virtual_time: bool = False,
+                 datasets: Optional[Dict[str, Tuple[str, Optional[Dict[str, Any]]]]] = None):
+        """
+        :param notebook: notebook path
+        :param execute: execute all cells in `__aenter__`
+        :param timeout: timeout per cell in seconds
+        :param kernel_provider: fork kernels from a zygote instead of starting a new process
+        :param virtual_time: skip sleeps in notebook code and advance all clocks instead
+        :param datasets: csv paths mapped to cache files written by `_jptest.write_dataset`
+                         and the keyword arguments of `pd.read_csv` calls to serve from them
+        """
         super().__init__(notebook, self.__execute_cell, execute)
 
         self._nc: NotebookClient = NotebookClient(self._nb, kernel_name='python3', timeout=timeout)
         self._lock: Lock = Lock()
+        self._kernel_provider: Optional[ZygoteKernelProvider] = kernel_provider
+        self.virtual_time: bool = virtual_time
+        self._datasets: Optional[Dict[str, Tuple[str, Optional[Dict[str, Any]]]]] = datasets
+        self._runtime_installed: bool = False
+        self._stored_once: Dict[str, NotebookReference] = {}
+        self._codecs: List[str] = []
+        self.transfer_stats: TransferStats = TransferStats()
+        self._garbage: List[str] = []
+        self._scopes: List[List[str]] = []
+        self._namespace: Optional[str] = None
+        self._active_namespace: List[Optional[str]] = [None]
 
     async def __aenter__(self) -> "Notebook":
         """
@@ -28,7 +81,23 @@ class PythonNotebook(Notebook):
 
         :return: self
         """
+        # kernels returned by `fork` are already running
+        if self._nc.kc is not None:
+            return self
+
+        if self._kernel_provider is not None:
+            self._nc.kernel_manager_class = await self._kernel_provider.kernel_manager_class('python3')
+
         await self._nc.async_setup_kernel(cleanup_kc=False).__aenter__()
+        await self._install_runtime()
+
+        if self.virtual_time:
+            await self._execute_silently("__import__('_jptest').VirtualClock(globals()).install()")
+        if self._datasets:
+            await self._execute_silently(
+                f"__import__('_jptest').serve_datasets({await self._literal(pickle.dumps(self._datasets))})"
+            )
+
         await super().__aenter__()
 
         return self
@@ -42,10 +111,147 @@ class PythonNotebook(Notebook):
         :param exc_tb:
         """
         await super().__aexit__(exc_type, exc_val, exc_tb)
-        await self._nc._async_cleanup_kernel()
+
+        # isolated notebooks share the kernel of their parent
+        if self._namespace is not None:
+            await self._execute_silently(f"__import__('_jptest').discard({self._namespace!r})")
+            self._active_namespace[0] = None
+        else:
+            await self._nc._async_cleanup_kernel()
+
+    async def fork(self) -> "PythonNotebook":
+        """
+        clone the kernel including all variables into a new process (copy-on-write).
+        The returned notebook is already running and is closed using `async with`.
+
+        :return: new PythonNotebook
+        """
+        if not ZygoteKernelProvider.supported():
+            raise AssertionError('forking kernels is not supported on this platform')
+
+        path = os.path.join(tempfile.mkdtemp(prefix='jptest_'), 'fork.sock')
+
+        child = PythonNotebook(copy.deepcopy(self._nb), timeout=self._nc.timeout,
+                               kernel_provider=self._kernel_provider, virtual_time=self.virtual_time)
+        child._nc.kernel_manager_class = ZygoteKernelProvider.launcher_kernel_manager_class(path)
+        child._runtime_installed = self._runtime_installed
+        child._stored_once = dict(self._stored_once)
+        child._codecs = self._codecs
+
+        try:
+            await asyncio.gather(
+                self.execute_code(f'''
+                    __import__('runpy').run_path({ZYGOTE_SCRIPT!r})['fork_kernel']({path!r}, {self._nc.timeout})
+                '''),
+                child._nc.async_setup_kernel(cleanup_kc=False).__aenter__()
+            )
+        finally:
+            os.rmdir(os.path.dirname(path))
+
+        return child
+
+    async def isolate(self) -> "PythonNotebook":
+        """
+        create a notebook that shares this kernel but executes all code in its own namespace,
+        a copy of the current variables of this notebook. It is a lot cheaper than `fork`,
+        but only isolates variables, not modules, files or other state of the process.
+        Functions and classes defined in the notebook are created again to use the copy,
+        except for classes that can not be created again (e.g. enums or classes using `__slots__`)
+        and wrapper objects other than functions and `lru_cache`.
+        The returned notebook is already running and is closed using `async with`.
+
+        :return: new PythonNotebook
+        """
+        child = PythonNotebook(copy.deepcopy(self._nb), timeout=self._nc.timeout,
+                               kernel_provider=self._kernel_provider, virtual_time=self.virtual_time)
+        child._nc.kc, child._nc.km = self._nc.kc, self._nc.km
+        child._lock = self._lock
+        child._namespace = randomize_name('namespace')
+        child._active_namespace = self._active_namespace
+        child._runtime_installed = self._runtime_installed
+        child._stored_once = {key: child.ref(ref.name) for key, ref in self._stored_once.items()}
+        child._codecs = self._codecs
+
+        await self._execute_silently(f"__import__('_jptest').isolate(globals(), {child._namespace!r})")
+
+        return child
+
+    def _enter_namespace(self) -> str:
+        """
+        code to switch the kernel to the namespace of this notebook, must be executed
+        before any other code while holding the lock
+
+        :return: code string (empty if already active)
+        """
+        if self._active_namespace[0] == self._namespace:
+            return ''
+
+        return f"__import__('_jptest').enter({self._namespace!r})\n"
+
+    def _entered_namespace(self, content: Dict[str, Any]):
+        """
+        remember the active namespace after executing code returned by `_enter_namespace`
+
+        :param content: content of the execute reply
+        """
+        # failed requests may have stopped before or after switching
+        if content['status'] == 'ok':
+            self._active_namespace[0] = self._namespace
+        else:
+            self._active_namespace[0] = self.UNKNOWN_NAMESPACE
+
+    async def _install_runtime(self):
+        """
+        load the helper module `_jptest` in the kernel if not done yet
+        and negotiate compression codecs supported by both sides
+        """
+        if self._runtime_installed:
+            return
+
+        expressions = await self._execute_silently(
+            f"exec({RUNTIME_BOOTSTRAP!r}, {{'path': {RUNTIME_SCRIPT!r}}})",
+            codecs="__import__('_jptest').codecs()"
+        )
+
+        kernel_codecs = ast.literal_eval(expressions['codecs']['data']['text/plain'])
+        self._codecs = [c for c in runtime.codecs() if c in kernel_codecs]
+
+        self._runtime_installed = True
+
+    async def _execute_silently(self, code: str, **expressions: str) -> Dict[str, Any]:
+        """
+        execute code without adding a cell to the notebook or increasing the execution count
+
+        :param code: code string
+        :param expressions: expressions to evaluate after execution
+        :return: evaluated expressions as mime bundles
+        """
+        async with self._lock:
+            enter = self._enter_namespace()
+            reply = await self._nc.kc.execute(enter + code, silent=True, store_history=False,
+                                              user_expressions=expressions, reply=True, timeout=self._nc.timeout)
+            if enter:
+                self._entered_namespace(reply['content'])
+
+        content = reply['content']
+        if content['status'] == 'error':
+            raise NotebookError(content['ename'], content['evalue'], content['traceback'])
+
+        return content['user_expressions']
 
     async def __execute_cell(self, cell: NotebookCell):
         async with self._lock:
+            enter = self._enter_namespace()
+            if enter:
+                reply = await self._nc.kc.execute(enter, silent=True, store_history=False, reply=True,
+                                                  timeout=self._nc.timeout)
+
+                content = reply['content']
+                self._entered_namespace(content)
+
+                if content['status'] == 'error':
+                    raise NotebookError(content['ename'], content['evalue'], content['traceback'])
+
             await self._nc.async_execute_cell(cell.raw_cell, cell_index=cell.idx)
 
     def __getattr__(self, name: str) -> NotebookReference:
@@ -75,9 +281,62 @@ class PythonNotebook(Notebook):
         """
         return tuple(self.ref(n) for n in names)
 
+    def _owned_ref(self, name: str) -> NotebookReference:
+        """
+        get a reference to a variable created by the test context.
+        The variable is deleted by the next `collect` after the reference (and every reference
+        derived from it) is garbage collected or when the enclosing `scope` is left.
+
+        :param name: name of object
+        :return: NotebookReference
+        """
+        ref = self.ref(name)
+
+        # the finalizer must not keep the reference or the notebook alive
+        weakref.finalize(ref, self._garbage.append, name).atexit = False
+        if len(self._scopes) > 0:
+            self._scopes[-1].append(name)
+
+        return ref
+
+    async def collect(self):
+        """
+        delete all variables whose owning references were released in a single round-trip.
+        Variables are never deleted implicitly, so code using their names keeps working until
+        this method is called.
+        """
+        if len(self._garbage) == 0:
+            return
+
+        # keep the list object, finalizers are bound to it
+        names = self._garbage[:]
+        del self._garbage[:len(names)]
+
+        await self._execute_silently(f"__import__('_jptest').release(globals(), {names!r})")
+
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator["PythonNotebook"]:
+        """
+        delete all variables created by `store`, `get` and `copy` with random names
+        when leaving the context, even if references to them are still in use
+
+        :return: self
+        """
+        names = []
+        self._scopes.append(names)
+
+        try:
+            yield self
+        finally:
+            self._scopes.remove(names)
+            self._garbage.extend(names)
+
+            await self.collect()
+
     async def get(self, name: str) -> NotebookReference:
         """
-        copy object to a random name and return a reference
+        copy object to a random name and return a reference.
+        The variable is deleted by `collect` once the reference is garbage collected.
 
         :param name: name of object
         :return: NotebookReference
@@ -96,7 +355,8 @@ class PythonNotebook(Notebook):
     async def store(self, value: Any, name: str = None) -> NotebookReference:
         """
         store a value in the notebook context.
-        A random name is chosen if no custom name is given.
+        A random name is chosen if no custom name is given, the variable is
+        deleted by `collect` once the returned reference is garbage collected.
 
         :param value: variable value in notebook
         :param name: variable name in notebook
@@ -105,29 +365,158 @@ class PythonNotebook(Notebook):
         # choose a random name if no custom name is provided
         if name is None:
             name = randomize_name('stored')
+            ref = self._owned_ref
+        else:
+            ref = self.ref
 
         # handle references
         if isinstance(value, NotebookReference):
             # handle local references (from same notebook)
             if value.is_from(self):
-                return await value.copy(name)
+                await value.copy(name)
+                return ref(name)
+
+            # handle remote references (from other notebook) without the test context if possible
+            elif self.DIRECT_TRANSFER and isinstance(value._nb, PythonNotebook):
+                await self._transfer(value, name)
+                return ref(name)
 
-            # handle remote references (from other notebook)
             else:
                 encoded_value = await value.receive(deserialize=False)
 
+        # handle values pickled once for many notebooks
+        elif isinstance(value, Payload):
+            await self.execute_code(f'''
+                {name} = __import__('_jptest').load({await value.path(self.transfer_dir())!r}, False)
+            ''')
+            return ref(name)
+
         # handle any other values
         else:
             encoded_value = pickle.dumps(value)
 
         # send to notebook
+        await self._store_pickled(name, encoded_value)
+
+        # return reference
+        return ref(name)
+
+    async def _store_pickled(self, name: str, encoded_value: bytes):
+        """
+        compress a pickled value if large enough and assign it to a name in the notebook context
+
+        :param name: variable name in notebook
+        :param encoded_value: pickled value
+        """
         await self.execute_code(f'''
-            import pickle
-            {name} = pickle.loads({encoded_value})
+            {name} = {await self._literal(encoded_value)}
         ''')
 
-        # return reference
-        return self.ref(name)
+    async def _literal(self, encoded_value: bytes) -> str:
+        """
+        create an expression that unpickles a value in the notebook context
+
+        :param encoded_value: pickled value
+        :return: expression
+        """
+        start = time.perf_counter()
+        codec, data = await offload(len(encoded_value), runtime.compress,
+                                    encoded_value, self.COMPRESSION_THRESHOLD, self._codecs)
+
+        self.transfer_stats.add(codec, len(encoded_value), len(data), time.perf_counter() - start)
+        return f"__import__('_jptest').loads({codec!r}, {data})"
+
+    @staticmethod
+    def _decode(output: str, deserialize: bool) -> Tuple[str, int, int, Any]:
+        """
+        decode a value encoded by `_jptest.encode` in the notebook context
+
+        :param output: `text/plain` output, the representation of codec name
+                       and base64 encoded data separated by a colon
+        :param deserialize: unpickle the value
+        :return: tuple of codec, pickled size, transferred size and (pickled) value
+        """
+        codec, data = ast.literal_eval(output).split(':', 1)
+        data = base64.b64decode(data.encode('ascii'))
+        value = runtime.decompress(codec, data)
+
+        return codec, len(value), len(data), pickle.loads(value) if deserialize else value
+
+    async def _transfer(self, value: NotebookReference, name: str):
+        """
+        let the kernel of `value` write the pickled object to a file that is read by this kernel
+
+        :param value: reference from another notebook
+        :param name: variable name in this notebook
+        """
+        fd, path = tempfile.mkstemp(prefix='jptest_', suffix='.pickle', dir=self.transfer_dir())
+        os.close(fd)
+
+        try:
+            await value._nb.ref(f"__import__('_jptest').dump({await value._resolve()}, {path!r})").receive()
+
+            (await self.execute_code(f'''
+                {name} = __import__('_jptest').load({path!r})
+            ''')).output()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    @classmethod
+    def transfer_dir(cls) -> str:
+        """
+        directory for transfers between kernels, shared memory if available
+
+        :return: directory path
+        """
+        if cls.TRANSFER_DIR is None:
+            if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+                cls.TRANSFER_DIR = '/dev/shm'
+            else:
+                cls.TRANSFER_DIR = tempfile.gettempdir()
+
+        return cls.TRANSFER_DIR
+
+    async def store_once(self, value: Any) -> NotebookReference:
+        """
+        store a value in the notebook context unless
+        an identically serialized value was stored before
+
+        :param value: variable value in notebook
+        :return: reference to created or existing variable
+        """
+        encoded_value = pickle.dumps(value)
+        key = hashlib.sha256(encoded_value).hexdigest()
+
+        if key not in self._stored_once:
+            name = randomize_name('stored')
+            await self._store_pickled(name, encoded_value)
+
+            self._stored_once[key] = self.ref(name)
+
+        return self._stored_once[key]
+
+    @staticmethod
+    async def broadcast(value: Any, name: Optional[str], notebooks: List["PythonNotebook"]) \
+            -> List[NotebookReference]:
+        """
+        store a value in many notebooks but serialize it only once
+
+        :param value: value or Payload (reused by later calls)
+        :param name: variable name in every notebook (random if None)
+        :param notebooks: list of notebooks
+        :return: list of references
+        """
+        if isinstance(value, Payload):
+            return await asyncio.gather(*[nb.store(value, name) for nb in notebooks])
+
+        # temporary payloads are removed as soon as all notebooks have read them
+        payload = Payload(value)
+
+        try:
+            return await asyncio.gather(*[nb.store(payload, name) for nb in notebooks])
+        finally:
+            payload.remove()
 
     async def stores(self, **kwargs) -> Tuple[NotebookReference, ...]:
         """
@@ -209,13 +598,9 @@ class PythonNotebook(Notebook):
         :param fun: function
         :return:
         """
-        code = getsource(fun)
+        code, fun_name = function_source(fun)
         await self.execute_code(code)
 
-        fun_name = fun.__name__
-        if fun_name == '<lambda>':
-            fun_name = code.split('=')[0].strip()
-
         return self.ref(fun_name)
 
     def replace_fun(self, fun_name: str, replacement: Callable) -> NotebookFunctionReplacement:
@@ -228,6 +613,16 @@ class PythonNotebook(Notebook):
         """
         return NotebookFunctionReplacement(self, fun_name, replacement)
 
+    def patch(self, replacements: Dict[str, Any]) -> NotebookPatch:
+        """
+        replace multiple functions, module attributes or other objects in a single round-trip.
+        Patches may be nested and are restored in reverse order.
+
+        :param replacements: dotted names (e.g. `time.sleep`) and functions, references or values to use instead
+        :return: instance of NotebookPatch
+        """
+        return NotebookPatch(self, replacements)
+
     def track_fun(self, fun_name: str, *parameters: str,
                   all_parameters: bool = False, return_values: bool = True) -> NotebookFunctionWrapper:
         """
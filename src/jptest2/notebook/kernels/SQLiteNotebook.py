@@ -1,22 +1,46 @@
+import asyncio
+import os
 import re
+import sqlite3
+import tempfile
+import time
 from os import PathLike
-from typing import Union, Optional
+from pathlib import Path
+from typing import Union, Optional, Tuple, List, Dict, AsyncIterator
 
 import aiosqlite
 
 from .. import Notebook
 from ..NotebookCell import NotebookCell
+from ..QueryComparison import QueryComparison
+from ..QueryProfile import QueryProfile
+from ..util import strip_statement
 
 
 class SQLiteNotebook(Notebook):
-    def __init__(self, notebook: Union[str, PathLike], execute: bool = False):
-        super().__init__(notebook, self.__execute_cell, execute)
+    def __init__(self, notebook: Union[str, PathLike], execute: bool = False,
+                 template: Optional[Union[str, PathLike]] = None, explain: bool = False):
+        """
+        :param notebook: notebook path
+        :param execute: execute all cells in `__aenter__`
+        :param template: database file (see `snapshot`) copied into memory in `__aenter__`
+        :param explain: capture the query plan of every statement in `NotebookCell.profiles`
+        """
+        super().__init__(notebook, self.__execute_cell, execute, self.__iter_rows)
         self.db: Optional
+        self.explain: bool = explain
+        self._template: Optional[Union[str, PathLike]] = template
 
     async def __aenter__(self) -> "Notebook":
         self.db = aiosqlite.connect(':memory:')
 
         await self.db.__aenter__()
+
+        if self._template is not None:
+            uri = f'{Path(self._template).absolute().as_uri()}?mode=ro'
+            async with aiosqlite.connect(uri, uri=True) as template:
+                await template.backup(self.db)
+
         await super().__aenter__()
 
         return self
@@ -25,11 +49,145 @@ class SQLiteNotebook(Notebook):
         await super().__aexit__(exc_type, exc_val, exc_tb)
         await self.db.__aexit__(exc_type, exc_val, exc_tb)
 
+    async def snapshot(self, path: Optional[Union[str, PathLike]] = None) -> str:
+        """
+        write the current database to a file that can be used as `template`
+
+        :param path: file path (default: new temporary file)
+        :return: file path
+        """
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix='jptest_'), 'template.db')
+
+        # backups wait for open write transactions to finish
+        await self.db.commit()
+
+        async with aiosqlite.connect(path) as target:
+            await self.db.backup(target)
+
+        return str(path)
+
+    async def _query(self, statement: str) -> Tuple[List[str], List[Tuple]]:
+        async with self.db.execute(statement) as cursor:
+            return [c[0] for c in cursor.description or []], await cursor.fetchall()
+
+    async def compare_queries(self, query: str, expected: str, sample: int = 5) -> QueryComparison:
+        """
+        compare the results of two queries inside the database regardless of row order
+
+        :param query: query to check, e.g. the source of a cell
+        :param expected: query returning the expected result
+        :param sample: maximum number of differing rows to receive per direction
+        :return: QueryComparison
+        """
+        query, expected = strip_statement(query), strip_statement(expected)
+
+        query_columns, _ = await self._query(f'SELECT * FROM ({query}\n) LIMIT 0')
+        expected_columns, _ = await self._query(f'SELECT * FROM ({expected}\n) LIMIT 0')
+
+        if len(query_columns) != len(expected_columns):
+            return QueryComparison([], [], f'expected {len(expected_columns)} columns, got {len(query_columns)}')
+
+        # SQLite does not support EXCEPT ALL, so duplicates are numbered
+        columns = ', '.join(f'c{i}' for i in range(len(query_columns)))
+
+        async def difference(left: str, right: str) -> List[Tuple]:
+            _, rows = await self._query(f'''
+                WITH jptest_left({columns}) AS ({left}
+                ), jptest_right({columns}) AS ({right}
+                )
+                SELECT {columns} FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY {columns}) AS jptest_n FROM jptest_left
+                    EXCEPT
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY {columns}) AS jptest_n FROM jptest_right
+                )
+                LIMIT {int(sample)}
+            ''')
+            return rows
+
+        return QueryComparison(await difference(expected, query), await difference(query, expected))
+
+    async def _explain(self, statement: str) -> Dict:
+        """
+        get the query plan of a statement without executing it
+
+        :param statement: sql statement
+        :return: keyword arguments for QueryProfile
+        """
+        try:
+            _, rows = await self._query(f'EXPLAIN QUERY PLAN {statement}')
+        except sqlite3.Error:
+            return {}
+
+        depth = {0: -1}
+        plan, full_scans, scan_parents = [], [], []
+
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append('  ' * depth[node_id] + detail)
+
+            # `SCAN t` reads all rows, `SCAN t USING INDEX i` and `SEARCH t ...` use an index
+            match = re.match(r'SCAN (\w+)(?: AS \w+)?$', detail)
+            if match:
+                full_scans.append(match.group(1))
+                scan_parents.append(parent)
+
+        # nested loops over multiple full scans on the same level produce the cartesian product
+        cross_joins = sum(scan_parents.count(p) - 1 for p in set(scan_parents))
+
+        return {'plan': plan, 'full_scans': full_scans, 'cross_joins': cross_joins}
+
+    @staticmethod
+    def _statements(cell: NotebookCell) -> List[str]:
+        return list(filter(lambda x: x, re.split(r';$', cell.source, flags=re.MULTILINE)))
+
     async def __execute_cell(self, cell: NotebookCell):
-        statements = list(filter(lambda x: x, re.split(r';$', cell.source, flags=re.MULTILINE)))
+        statements = self._statements(cell)
         last_index = len(statements) - 1
 
+        result = None
+        cell.profiles = []
+
         for i, statement in enumerate(statements):
+            plan = await self._explain(statement) if self.explain else {}
+
+            start = time.perf_counter()
             async with self.db.execute(statement) as cursor:
                 if i == last_index:
-                    return await cursor.fetchall()
+                    result = await cursor.fetchall()
+
+            cell.profiles.append(QueryProfile(statement.strip(), time.perf_counter() - start, **plan))
+
+        return result
+
+    async def __iter_rows(self, cell: NotebookCell, batch_size: int,
+                          max_rows: Optional[int]) -> AsyncIterator[List[Tuple]]:
+        statements = self._statements(cell)
+        if len(statements) == 0:
+            return
+
+        for statement in statements[:-1]:
+            async with self.db.execute(statement):
+                pass
+
+        cursor = await self.db.cursor()
+        remaining = max_rows
+
+        try:
+            await cursor.execute(statements[-1])
+
+            while remaining is None or remaining > 0:
+                rows = await cursor.fetchmany(batch_size if remaining is None else min(batch_size, remaining))
+                if len(rows) == 0:
+                    break
+
+                if remaining is not None:
+                    remaining -= len(rows)
+
+                yield rows
+        except asyncio.CancelledError:
+            await self.db.interrupt()
+            raise
+        finally:
+            # resets the statement so SQLite does not compute the remaining rows
+            await cursor.close()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+from asyncio import Lock
+from asyncio.subprocess import Process
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from jupyter_client import AsyncKernelManager
+from jupyter_client.kernelspec import KernelSpecManager
+
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(__file__), 'zygote.py')
+
+
+class ZygoteKernelProvider:
+    """
+    keeps a pre-initialized process per kernel spec and forks new kernels from it
+    """
+
+    def __init__(self, preload: Iterable[str] = ()):
+        """
+        :param preload: modules to import in the zygote, e.g. `numpy` or `pandas`
+        """
+        self.preload: List[str] = list(preload)
+
+        self._dir: Optional[str] = None
+        self._zygotes: Dict[str, Tuple[Process, str]] = {}
+        self._lock: Lock = Lock()
+
+    @staticmethod
+    def supported() -> bool:
+        """
+        check if forking kernels is possible on this platform
+
+        :return: True if supported
+        """
+        return hasattr(os, 'fork') and hasattr(socket, 'send_fds') and hasattr(socket, 'AF_UNIX')
+
+    async def __aenter__(self) -> "ZygoteKernelProvider":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @staticmethod
+    def _kernel_argv(kernel_name: str) -> Optional[List[str]]:
+        """
+        get the command line of a kernel spec if it starts an ipykernel
+
+        :param kernel_name: kernel spec name
+        :return: argv or None if the kernel can not be forked
+        """
+        argv = list(KernelSpecManager().get_kernel_spec(kernel_name).argv)
+        if argv[1:3] != ['-m', 'ipykernel_launcher']:
+            return None
+
+        if argv[0] in ('python', f'python{sys.version_info[0]}', f'python{sys.version_info[0]}.{sys.version_info[1]}'):
+            argv[0] = sys.executable
+
+        return argv
+
+    async def start(self, kernel_name: str = 'python3') -> Optional[str]:
+        """
+        start the zygote for a kernel spec if not running yet
+
+        :param kernel_name: kernel spec name
+        :return: socket path or None if the kernel can not be forked
+        """
+        async with self._lock:
+            if kernel_name in self._zygotes:
+                return self._zygotes[kernel_name][1]
+
+            argv = self._kernel_argv(kernel_name)
+            if not self.supported() or argv is None:
+                return None
+
+            if self._dir is None:
+                self._dir = tempfile.mkdtemp(prefix='jptest_')
+
+            path = os.path.join(self._dir, f'{len(self._zygotes)}.sock')
+            process = await asyncio.create_subprocess_exec(
+                argv[0], ZYGOTE_SCRIPT, 'serve', path, *self.preload,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+            )
+
+            if await process.stdout.readline() != b'ready\n':
+                await process.wait()
+                raise RuntimeError(f'zygote for kernel {kernel_name} exited with code {process.returncode}')
+
+            self._zygotes[kernel_name] = process, path
+            return path
+
+    async def kernel_manager_class(self, kernel_name: str = 'python3') -> Type[AsyncKernelManager]:
+        """
+        get a kernel manager class that starts kernels by forking the zygote
+
+        :param kernel_name: kernel spec name
+        :return: kernel manager class
+        """
+        path = await self.start(kernel_name)
+        if path is None:
+            return AsyncKernelManager
+
+        return self.launcher_kernel_manager_class(path)
+
+    @staticmethod
+    def launcher_kernel_manager_class(path: str) -> Type[AsyncKernelManager]:
+        """
+        get a kernel manager class that requests kernels from the process listening on `path`
+
+        :param path: unix socket path
+        :return: kernel manager class
+        """
+
+        class ZygoteKernelManager(AsyncKernelManager):
+            def format_kernel_cmd(self, extra_arguments: List[str] = None) -> List[str]:
+                cmd = super().format_kernel_cmd(extra_arguments)
+                return [sys.executable, ZYGOTE_SCRIPT, 'launch', path, *cmd[3:]]
+
+        return ZygoteKernelManager
+
+    async def close(self):
+        """
+        stop all zygotes, already forked kernels keep running
+        """
+        async with self._lock:
+            for process, _ in self._zygotes.values():
+                process.stdin.close()
+                await process.wait()
+
+            self._zygotes = {}
+
+            if self._dir is not None:
+                try:
+                    os.rmdir(self._dir)
+                except OSError:
+                    pass
+
+                self._dir = None
@@ -1,4 +1,5 @@
 from .PythonNotebook import PythonNotebook
+from .ZygoteKernelProvider import ZygoteKernelProvider
 
 try:
     from .DuckDBNotebook import DuckDBNotebook
@@ -0,0 +1,1169 @@
+"""
+helpers executed inside Python kernels
+
+Every kernel loads this file by path once at startup and registers it as module `_jptest`,
+so it must only depend on the standard library at module level. The test context calls
+its functions using short expressions like `__import__('_jptest').encode(...)` instead of
+sending generated source code for every operation.
+"""
+import hashlib
+import math
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+def map(fun: Callable, args_list: List[Any], kwargs_list: Optional[List[Dict[str, Any]]],
+        return_exceptions: bool, vectorize: bool) -> List[Any]:
+    """
+    call a function with many inputs
+
+    :param fun: function to call
+    :param args_list: tuples of positional arguments or single arguments
+    :param kwargs_list: keyword arguments per call
+    :param return_exceptions: return raised exceptions instead of raising the first one
+    :param vectorize: try to call `fun` once using a NumPy array of all inputs
+                      (one array per parameter if all inputs are tuples of the same length)
+    :return: list of return values or exceptions
+    """
+    if vectorize and kwargs_list is None and len(args_list) > 0:
+        try:
+            import numpy as np
+
+            # tuples of the same length are passed as one array per parameter
+            lengths = {len(args) if isinstance(args, tuple) else None for args in args_list}
+            if lengths == {None}:
+                result = fun(np.asarray(args_list))
+            elif len(lengths) == 1:
+                result = fun(*[np.asarray(column) for column in zip(*args_list)])
+            else:
+                result = None
+
+            # only arrays with one row per input are results of a vectorized call
+            if tuple(getattr(result, 'shape', ()))[:1] == (len(args_list),):
+                return result.tolist()
+        except Exception:
+            pass
+
+    results = []
+
+    for i, args in enumerate(args_list):
+        if not isinstance(args, tuple):
+            args = (args,)
+
+        kwargs = kwargs_list[i] if kwargs_list is not None else {}
+
+        try:
+            results.append(fun(*args, **kwargs))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+
+            results.append(e)
+
+    return results
+
+
+def _truncate(text: str, length: int = 1000) -> str:
+    return text if len(text) <= length else text[:length] + '...'
+
+
+def _sort_rows(array):
+    import numpy as np
+
+    if array.ndim == 1:
+        return np.sort(array, kind='stable')
+
+    rows = array.reshape(len(array), -1)
+    return array[np.lexsort(rows.T[::-1])]
+
+
+def _matches_frame(actual, expected, rtol: float, atol: float, check_order: bool) -> Tuple[bool, Optional[str]]:
+    import pandas as pd
+
+    if not check_order:
+        if isinstance(actual, pd.DataFrame):
+            if set(actual.columns) != set(expected.columns):
+                return False, f'columns differ: {list(actual.columns)} != {list(expected.columns)}'
+
+            actual = actual[list(expected.columns)]
+            actual = actual.sort_values(list(actual.columns), ignore_index=True)
+            expected = expected.sort_values(list(expected.columns), ignore_index=True)
+        else:
+            actual = actual.sort_values(ignore_index=True)
+            expected = expected.sort_values(ignore_index=True)
+
+    assert_equal = pd.testing.assert_frame_equal if isinstance(actual, pd.DataFrame) else pd.testing.assert_series_equal
+
+    try:
+        assert_equal(actual, expected, check_exact=False, rtol=rtol, atol=atol)
+        return True, None
+    except AssertionError as e:
+        return False, _truncate(str(e).strip())
+
+
+def _matches_array(actual, expected, rtol: float, atol: float, check_order: bool,
+                   sample: int) -> Tuple[bool, Optional[str]]:
+    import numpy as np
+
+    actual, expected = np.asarray(actual), np.asarray(expected)
+
+    if actual.shape != expected.shape:
+        return False, f'shape {actual.shape} != {expected.shape}'
+
+    if not check_order and actual.ndim > 0:
+        actual, expected = _sort_rows(actual), _sort_rows(expected)
+
+    if np.issubdtype(actual.dtype, np.number) and np.issubdtype(expected.dtype, np.number):
+        equal = np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+    else:
+        equal = np.asarray(actual == expected)
+
+    if equal.all():
+        return True, None
+
+    positions = np.argwhere(~equal)
+    differences = ', '.join(
+        f'{tuple(int(i) for i in p)}: {actual[tuple(p)]!r} != {expected[tuple(p)]!r}'
+        for p in positions[:sample]
+    )
+
+    return False, _truncate(f'{len(positions)} of {equal.size} values differ ({differences})')
+
+
+def matches(actual: Any, expected: Any, rtol: float, atol: float, check_order: bool,
+            sample: int) -> Tuple[bool, Optional[str]]:
+    """
+    compare two values using vectorized operations where possible
+
+    :param actual: value to check
+    :param expected: expected value
+    :param rtol: relative tolerance for numbers
+    :param atol: absolute tolerance for numbers
+    :param check_order: compare rows of frames and arrays and items of sequences in order
+    :param sample: maximum number of differing values to describe
+    :return: tuple of equality and a short description of the differences
+    """
+    module = type(expected).__module__.split('.')[0]
+
+    if module == 'pandas' and type(expected).__name__ in ('DataFrame', 'Series'):
+        if type(actual) is not type(expected):
+            return False, f'expected {type(expected).__name__}, got {type(actual).__name__}'
+
+        return _matches_frame(actual, expected, rtol, atol, check_order)
+
+    if module == 'numpy' or type(actual).__module__.split('.')[0] == 'numpy':
+        return _matches_array(actual, expected, rtol, atol, check_order, sample)
+
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool) \
+            and isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        if math.isclose(actual, expected, rel_tol=rtol, abs_tol=atol) \
+                or (math.isnan(actual) and math.isnan(expected)):
+            return True, None
+
+        return False, f'{actual!r} != {expected!r}'
+
+    if not check_order and isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        actual, expected = sorted(actual, key=repr), sorted(expected, key=repr)
+
+    try:
+        if bool(actual == expected):
+            return True, None
+    except ValueError:
+        return False, f'expected {type(expected).__name__}, got {type(actual).__name__}'
+
+    return False, _truncate(f'{actual!r} != {expected!r}')
+
+
+def _call(fun: Callable, args: Tuple) -> Tuple[Any, Optional[Exception]]:
+    import copy
+
+    # functions must not see modifications made to their arguments by the other one
+    try:
+        return fun(*copy.deepcopy(args)), None
+    except Exception as e:
+        return None, e
+
+
+def _check_case(fun: Callable, reference: Callable, args: Tuple, rtol: float, atol: float) -> Optional[str]:
+    actual, actual_error = _call(fun, args)
+    expected, expected_error = _call(reference, args)
+
+    if expected_error is not None:
+        if actual_error is not None and type(actual_error) is type(expected_error):
+            return None
+
+        got = type(actual_error).__name__ if actual_error is not None else _truncate(repr(actual))
+        return f'expected {type(expected_error).__name__}, got {got}'
+
+    if actual_error is not None:
+        return _truncate(f'raised {type(actual_error).__name__}: {actual_error}')
+
+    return matches(actual, expected, rtol, atol, True, 1)[1]
+
+
+def _check_vectorized(fun: Callable, reference: Callable, inputs: List[Tuple],
+                      rtol: float, atol: float) -> Optional[List[int]]:
+    import numpy as np
+
+    try:
+        columns = [np.asarray(column) for column in zip(*inputs)]
+        actual = np.asarray(fun(*[c.copy() for c in columns]))
+        expected = np.asarray(reference(*[c.copy() for c in columns]))
+    except Exception:
+        return None
+
+    if actual.shape != expected.shape or actual.shape[:1] != (len(inputs),):
+        return None
+
+    if np.issubdtype(actual.dtype, np.number) and np.issubdtype(expected.dtype, np.number):
+        equal = np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+    else:
+        equal = np.asarray(actual == expected)
+
+    return np.flatnonzero(~equal.reshape(len(inputs), -1).all(axis=1)).tolist()
+
+
+def check(fun: Callable, reference: Callable, generator: Callable, cases: int, seed: int, vectorize: bool,
+          rtol: float, atol: float, examples: int) -> Tuple[int, int, List[Tuple[Tuple, str]]]:
+    """
+    compare a function with a reference implementation using generated inputs
+
+    :param fun: function to check
+    :param reference: reference implementation
+    :param generator: function receiving a `random.Random` and returning a tuple of arguments or a single argument
+    :param cases: number of inputs to generate
+    :param seed: seed of the random number generator
+    :param vectorize: try to call both functions once using NumPy arrays of all inputs
+    :param rtol: relative tolerance for numbers
+    :param atol: absolute tolerance for numbers
+    :param examples: maximum number of failing inputs to return
+    :return: tuple of checked cases, failed cases and the smallest failing inputs with a description
+    """
+    import random
+
+    rng = random.Random(seed)
+    inputs = []
+
+    for _ in range(cases):
+        args = generator(rng)
+        inputs.append(args if isinstance(args, tuple) else (args,))
+
+    # vectorized calls only find candidates, which are checked one by one to describe the difference
+    candidates = _check_vectorized(fun, reference, inputs, rtol, atol) if vectorize else None
+    if candidates is None:
+        candidates = range(len(inputs))
+
+    failures = []
+    for i in candidates:
+        message = _check_case(fun, reference, inputs[i], rtol, atol)
+        if message is not None:
+            failures.append((inputs[i], message))
+
+    failures.sort(key=lambda f: len(repr(f[0])))
+    return len(inputs), len(failures), failures[:examples]
+
+
+def _update_digest(h, value: Any):
+    module = type(value).__module__.split('.')[0]
+
+    # NumPy and pandas are only imported if the value is from these modules
+    if module == 'numpy':
+        import numpy as np
+
+        if isinstance(value, np.generic):
+            return _update_digest(h, value.item())
+
+        if isinstance(value, np.ndarray):
+            h.update(f'ndarray:{value.dtype.str}:{value.shape}:'.encode('utf-8'))
+
+            if value.dtype.hasobject:
+                for item in value.flat:
+                    _update_digest(h, item)
+            else:
+                h.update(np.ascontiguousarray(value).tobytes())
+
+            return
+
+    if module == 'pandas' and type(value).__name__ in ('DataFrame', 'Series'):
+        import pandas as pd
+
+        if isinstance(value, pd.Series):
+            value = value.to_frame()
+            h.update(b'Series:')
+        else:
+            h.update(b'DataFrame:')
+
+        for column in value.columns:
+            _update_digest(h, column)
+            h.update(pd.util.hash_pandas_object(value[column], index=False).values.tobytes())
+
+        return
+
+    if value is None or isinstance(value, (bool, int, float, complex)):
+        h.update(f'{type(value).__name__}:{value!r};'.encode('utf-8'))
+
+    elif isinstance(value, str):
+        encoded = value.encode('utf-8')
+        h.update(f'str:{len(encoded)}:'.encode('utf-8') + encoded)
+
+    elif isinstance(value, (bytes, bytearray)):
+        h.update(f'bytes:{len(value)}:'.encode('utf-8') + bytes(value))
+
+    elif isinstance(value, (list, tuple)):
+        h.update(f'{type(value).__name__}:{len(value)}:'.encode('utf-8'))
+        for item in value:
+            _update_digest(h, item)
+
+    # the order of sets and dicts does not matter
+    elif isinstance(value, (set, frozenset)):
+        h.update(f'set:{len(value)}:'.encode('utf-8'))
+        for item_digest in sorted(digest(item) for item in value):
+            h.update(item_digest.encode('ascii'))
+
+    elif isinstance(value, dict):
+        h.update(f'dict:{len(value)}:'.encode('utf-8'))
+        for item_digest in sorted(digest(item) for item in value.items()):
+            h.update(item_digest.encode('ascii'))
+
+    else:
+        import pickle
+        h.update(f'{type(value).__qualname__}:'.encode('utf-8') + pickle.dumps(value, protocol=4))
+
+
+def digest(value: Any) -> str:
+    """
+    calculate a content hash that is stable across processes.
+    Sets and dicts are hashed independent of their order, pandas objects
+    by their column names and values (not their index). Objects of other
+    types are hashed using their pickled representation.
+
+    :param value: value to hash
+    :return: hex digest
+    """
+    h = hashlib.sha256()
+    _update_digest(h, value)
+
+    return h.hexdigest()
+
+
+def dump(value: Any, path: str) -> int:
+    """
+    pickle a value to a file for another kernel to `load`
+
+    :param value: value to serialize
+    :param path: file path
+    :return: size in bytes
+    """
+    import pickle
+
+    with open(path, 'wb') as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        return file.tell()
+
+
+def load(path: str, remove: bool = True) -> Any:
+    """
+    unpickle a value written by `dump`
+
+    :param path: file path
+    :param remove: remove the file afterwards
+    :return: value
+    """
+    import os
+    import pickle
+
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    finally:
+        if remove:
+            os.remove(path)
+
+
+DATASETS: Dict[str, Tuple[str, Optional[Dict[str, Any]]]] = {}
+
+
+def write_dataset(frame: Any, path: str):
+    """
+    write a DataFrame to an uncompressed Arrow IPC file for `read_dataset`
+
+    :param frame: pandas DataFrame
+    :param path: file path
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame).combine_chunks()
+
+    with pa.OSFile(path, 'wb') as file:
+        with pa.ipc.new_file(file, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_dataset(path: str) -> Any:
+    """
+    map a file written by `write_dataset` into memory and create a DataFrame.
+    Numeric columns without missing values use the mapped memory directly,
+    writes to them only copy the affected pages and are not visible to other kernels.
+
+    :param path: file path
+    :return: pandas DataFrame
+    """
+    import mmap
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    with open(path, 'rb') as file:
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    address = np.frombuffer(memory, dtype=np.uint8).ctypes.data
+    table = pa.ipc.open_file(pa.BufferReader(pa.py_buffer(memory))).read_all()
+    frame = table.to_pandas(split_blocks=True)
+
+    # arrays created by pyarrow without copying are read-only, so numeric
+    # and date columns are mapped again as writable arrays and others are copied
+    columns = {}
+    for i, name in enumerate(frame.columns):
+        column = frame.iloc[:, i]
+        columns[i] = column.array
+
+        chunks = table.column(name).chunks if name in table.column_names else []
+        if len(chunks) == 1 and chunks[0].null_count == 0 and pa.types.is_primitive(chunks[0].type) \
+                and isinstance(column.dtype, np.dtype) and column.dtype.kind in 'iufmM' \
+                and chunks[0].type.bit_width == column.dtype.itemsize * 8:
+            offset = chunks[0].buffers()[1].address - address + chunks[0].offset * column.dtype.itemsize
+            columns[i] = np.frombuffer(memory, dtype=column.dtype, count=len(chunks[0]), offset=offset)
+
+        elif isinstance(getattr(columns[i], '_ndarray', None), np.ndarray) \
+                and not columns[i]._ndarray.flags.writeable:
+            columns[i] = columns[i].copy()
+
+    result = pd.DataFrame(columns, index=frame.index, copy=False)
+    result.columns = frame.columns
+
+    return result
+
+
+def _serve_datasets(pandas: Any):
+    import functools
+    import os
+
+    read_csv = pandas.read_csv
+
+    @functools.wraps(read_csv)
+    def cached_read_csv(filepath_or_buffer, *args, **kwargs):
+        if len(args) == 0 and isinstance(filepath_or_buffer, (str, os.PathLike)):
+            path, read_csv_kwargs = DATASETS.get(os.path.abspath(filepath_or_buffer), (None, None))
+            if read_csv_kwargs is not None and read_csv_kwargs == kwargs:
+                return read_dataset(path)
+
+        return read_csv(filepath_or_buffer, *args, **kwargs)
+
+    pandas.read_csv = cached_read_csv
+
+
+class _PandasFinder:
+    """
+    patches pandas once it is imported instead of importing it at startup
+    """
+
+    def find_spec(self, name, path, target=None):
+        import importlib.util
+        import sys
+
+        if name != 'pandas':
+            return None
+
+        sys.meta_path.remove(self)
+
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.loader is None:
+            return spec
+
+        exec_module = spec.loader.exec_module
+
+        def exec_and_patch(module):
+            exec_module(module)
+            _serve_datasets(module)
+
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+def dataset(path: str) -> Any:
+    """
+    read a dataset registered in the test context
+
+    :param path: csv path
+    :return: pandas DataFrame
+    """
+    import os
+
+    if os.path.abspath(path) not in DATASETS:
+        raise KeyError(f'dataset {path} is not registered')
+
+    return read_dataset(DATASETS[os.path.abspath(path)][0])
+
+
+def serve_datasets(datasets: Dict[str, Tuple[str, Optional[Dict[str, Any]]]]):
+    """
+    let `pandas.read_csv` return cached datasets
+
+    :param datasets: absolute csv paths mapped to cache file paths and the keyword
+                     arguments calls to `read_csv` must use (None to not patch `read_csv`)
+    """
+    import sys
+
+    if len(DATASETS) == 0:
+        if 'pandas' in sys.modules:
+            _serve_datasets(sys.modules['pandas'])
+        else:
+            sys.meta_path.insert(0, _PandasFinder())
+
+    DATASETS.update(datasets)
+
+
+def codecs() -> List[str]:
+    """
+    list available compression codecs, preferred first
+
+    :return: list of codec names
+    """
+    available = ['zlib']
+
+    try:
+        import lz4.frame
+        available.insert(0, 'lz4')
+    except ImportError:
+        pass
+
+    return available
+
+
+def compress(data: bytes, threshold: int, allowed: List[str]) -> Tuple[str, bytes]:
+    """
+    compress data with the first allowed codec if it is large enough and actually shrinks
+
+    :param data: data to compress
+    :param threshold: minimum size in bytes to compress
+    :param allowed: codecs supported by both sides, preferred first
+    :return: tuple of codec name (`raw` if not compressed) and data
+    """
+    if len(data) < threshold or len(allowed) == 0:
+        return 'raw', data
+
+    if allowed[0] == 'lz4':
+        import lz4.frame
+        compressed = lz4.frame.compress(data)
+    else:
+        import zlib
+        compressed = zlib.compress(data, 1)
+
+    # incompressible data, e.g. random numbers, is not worth decompressing
+    if len(compressed) > 0.9 * len(data):
+        return 'raw', data
+
+    return allowed[0], compressed
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """
+    reverse `compress`
+
+    :param codec: codec name
+    :param data: compressed data
+    :return: data
+    """
+    if codec == 'raw':
+        return data
+    if codec == 'lz4':
+        import lz4.frame
+        return lz4.frame.decompress(data)
+    if codec == 'zlib':
+        import zlib
+        return zlib.decompress(data)
+
+    raise ValueError(f'unsupported codec {codec}')
+
+
+def encode(value: Any, threshold: int, allowed: List[str]) -> str:
+    """
+    pickle and compress a value for `receive`
+
+    :param value: value to encode
+    :param threshold: minimum size in bytes to compress
+    :param allowed: codecs supported by both sides, preferred first
+    :return: codec name and base64 encoded data separated by a colon
+    """
+    import base64
+    import pickle
+
+    codec, data = compress(pickle.dumps(value), threshold, allowed)
+    return f"{codec}:{base64.b64encode(data).decode('ascii')}"
+
+
+def loads(codec: str, data: bytes) -> Any:
+    """
+    decompress and unpickle a value sent by `store`
+
+    :param codec: codec name
+    :param data: compressed data
+    :return: value
+    """
+    import pickle
+    return pickle.loads(decompress(codec, data))
+
+
+def define(source: str, name: str, namespace: Dict[str, Any]) -> Callable:
+    """
+    execute the source of a function without adding it to the notebook namespace
+
+    :param source: function source (`def` or `name = lambda ...`)
+    :param name: name the source assigns the function to
+    :param namespace: globals of the defined function, usually `globals()` of the notebook
+    :return: function
+    """
+    local_namespace = {}
+    exec(source, namespace, local_namespace)
+
+    return local_namespace[name]
+
+
+def release(namespace: Dict[str, Any], names: List[str]):
+    """
+    delete variables that are no longer referenced by the test context
+
+    :param namespace: usually `globals()` of the notebook
+    :param names: variable names, missing ones are ignored
+    """
+    for name in names:
+        namespace.pop(name, None)
+
+
+def _patch_target(namespace: Dict[str, Any], path: str) -> Tuple[Any, str]:
+    """
+    find the object owning the last part of a dotted name
+
+    :param namespace: usually `globals()` of the notebook
+    :param path: dotted name like `fun`, `time.sleep` or `a.fun`
+    :return: owner (`namespace` for plain names) and attribute name
+    """
+    *parts, attribute = path.split('.')
+    if len(parts) == 0:
+        return namespace, attribute
+
+    # prefer notebook variables and import modules that are not imported in the notebook
+    if parts[0] in namespace:
+        owner, parts = namespace[parts[0]], parts[1:]
+    else:
+        import importlib
+
+        for i in range(len(parts), 0, -1):
+            try:
+                owner, parts = importlib.import_module('.'.join(parts[:i])), parts[i:]
+                break
+            except ImportError:
+                pass
+        else:
+            raise NameError(f'name {parts[0]!r} is not defined')
+
+    for part in parts:
+        owner = getattr(owner, part)
+
+    return owner, attribute
+
+
+def patch(namespace: Dict[str, Any], replacements: Dict[str, Any]) -> List[Tuple[Any, str, bool, Any]]:
+    """
+    replace variables and attributes
+
+    :param namespace: usually `globals()` of the notebook
+    :param replacements: dotted names and their replacements
+    :return: list of previous states to pass to `unpatch`
+    """
+    undo = []
+
+    try:
+        for path, value in replacements.items():
+            owner, attribute = _patch_target(namespace, path)
+
+            if owner is namespace:
+                undo.append((owner, attribute, attribute in owner, owner.get(attribute)))
+                owner[attribute] = value
+                continue
+
+            # keep descriptors like `staticmethod` and restore inherited attributes by deleting
+            try:
+                own = vars(owner)
+            except TypeError:
+                own = None
+
+            if own is None:
+                undo.append((owner, attribute, True, getattr(owner, attribute)))
+            else:
+                undo.append((owner, attribute, attribute in own, own.get(attribute)))
+
+            setattr(owner, attribute, value)
+    except BaseException:
+        unpatch(undo)
+        raise
+
+    return undo
+
+
+def unpatch(undo: List[Tuple[Any, str, bool, Any]]):
+    """
+    restore variables and attributes replaced by `patch` in reverse order
+
+    :param undo: return value of `patch`
+    """
+    for owner, attribute, existed, value in reversed(undo):
+        if isinstance(owner, dict):
+            if existed:
+                owner[attribute] = value
+            else:
+                owner.pop(attribute, None)
+        elif existed:
+            setattr(owner, attribute, value)
+        else:
+            delattr(owner, attribute)
+
+
+class Tracker:
+    """
+    records parameters and return values of calls to a function
+    """
+
+    def __init__(self, fun: Callable, parameters: Set[str], all_parameters: bool, return_values: bool):
+        """
+        :param fun: function to track
+        :param parameters: parameter names to track
+        :param all_parameters: include all parameters (ignore parameters)
+        :param return_values: include return values (None otherwise)
+        """
+        import inspect
+        from inspect import Parameter
+
+        # store properties
+        self._include_parameters = parameters
+        self._include_all_parameters = all_parameters
+        self._include_return_values = return_values
+
+        # analyse `fun`
+        self.fun = fun
+
+        self._fun_default_values = {}
+        self._fun_positions = []
+        self._fun_names = set()
+        self._fun_var_positional = None
+        self._fun_var_keyword = None
+
+        for index, param in enumerate(inspect.signature(fun).parameters.values()):
+            if param.default is not Parameter.empty:
+                self._fun_default_values[param.name] = param.default
+            if param.kind == Parameter.POSITIONAL_OR_KEYWORD or param.kind == Parameter.POSITIONAL_ONLY:
+                self._fun_positions.append(param.name)
+            if param.kind == Parameter.POSITIONAL_OR_KEYWORD or param.kind == Parameter.KEYWORD_ONLY:
+                self._fun_names.add(param.name)
+            if param.kind == Parameter.VAR_POSITIONAL:
+                self._fun_var_positional = index
+                self._fun_positions.append(param.name)
+            if param.kind == Parameter.VAR_KEYWORD:
+                self._fun_var_keyword = param.name
+
+        # store calls array
+        self.calls = []
+
+    def __call__(self) -> Callable:
+        def wrapper_fun(*args, **kwargs):
+            call_params = {}
+
+            # extract args
+            for i, val in enumerate(args):
+                name = self._fun_positions[min(i, len(self._fun_positions) - 1)]
+
+                if self._fun_var_positional is not None and i >= self._fun_var_positional:
+                    if name not in call_params:
+                        call_params[name] = []
+
+                    call_params[name].append(val)
+
+                else:
+                    call_params[name] = val
+
+            # extract kwargs
+            for name, val in kwargs.items():
+                if name in self._fun_names:
+                    call_params[name] = val
+                elif self._fun_var_keyword is not None:
+                    if self._fun_var_keyword not in call_params:
+                        call_params[self._fun_var_keyword] = {}
+
+                    call_params[self._fun_var_keyword][name] = val
+
+            # insert default values
+            for name, val in self._fun_default_values.items():
+                if name not in call_params:
+                    call_params[name] = val
+
+            # apply filter
+            if not self._include_all_parameters:
+                for key in list(call_params):
+                    if key not in self._include_parameters:
+                        del call_params[key]
+
+            # get result
+            result = self.fun(*args, **kwargs)
+
+            # append output
+            if self._include_return_values:
+                self.calls.append((call_params, result))
+            else:
+                self.calls.append((call_params, None))
+
+            # return fun result
+            return result
+
+        return wrapper_fun
+
+    def clear(self):
+        self.calls = []
+
+
+class VirtualClock:
+    """
+    lets sleeps in notebook code advance an offset added to all clocks instead of waiting
+    """
+
+    def __init__(self, namespace: Dict[str, Any]):
+        """
+        :param namespace: usually `globals()` of the notebook, sleeps are only skipped
+                          if a function defined there or in a namespace created by `isolate` is on the call stack
+        """
+        self.offset: float = 0.0
+        self._namespace: Dict[str, Any] = namespace
+        self._undo: Optional[List[Tuple[Any, str, bool, Any]]] = None
+
+    def _is_notebook(self, namespace: Dict[str, Any]) -> bool:
+        return namespace is self._namespace or _isolated(namespace)
+
+    def _from_notebook(self) -> bool:
+        import sys
+
+        frame = sys._getframe(2)
+        while frame is not None:
+            if self._is_notebook(frame.f_globals):
+                return True
+            frame = frame.f_back
+
+        return False
+
+    def install(self) -> "VirtualClock":
+        """
+        patch `time` and `asyncio.sleep` in the whole kernel process
+        and `datetime` imported by notebook code
+
+        :return: self
+        """
+        import asyncio
+        import builtins
+        import datetime
+        import sys
+        import time
+        import types
+
+        clock = self
+        real_import = builtins.__import__
+        real_sleep, real_asyncio_sleep = time.sleep, asyncio.sleep
+        real_time, real_time_ns = time.time, time.time_ns
+        real_monotonic, real_monotonic_ns = time.monotonic, time.monotonic_ns
+        real_perf_counter, real_perf_counter_ns = time.perf_counter, time.perf_counter_ns
+        real_datetime, real_date = datetime.datetime, datetime.date
+
+        def sleep(seconds):
+            if not clock._from_notebook():
+                return real_sleep(seconds)
+            if seconds < 0:
+                raise ValueError('sleep length must be non-negative')
+
+            clock.offset += seconds
+            real_sleep(0)
+
+        def asyncio_sleep(delay, result=None):
+            if clock._from_notebook():
+                clock.offset += max(delay, 0)
+                delay = 0
+
+            return real_asyncio_sleep(delay, result)
+
+        # the classes in `datetime` are used by compiled extensions like pandas and must not be replaced,
+        # so notebook code importing `datetime` receives a module containing replacements instead
+        class VirtualType(type):
+            def __instancecheck__(cls, instance):
+                return isinstance(instance, cls.__bases__[0])
+
+            def __subclasscheck__(cls, subclass):
+                return issubclass(subclass, cls.__bases__[0])
+
+        class VirtualDateTime(real_datetime, metaclass=VirtualType):
+            # all values are instances of the original class
+            def __new__(cls, *args, **kwargs):
+                return real_datetime(*args, **kwargs)
+
+            @classmethod
+            def now(cls, tz=None):
+                return real_datetime.fromtimestamp(time.time(), tz)
+
+            @classmethod
+            def utcnow(cls):
+                return cls.now(datetime.timezone.utc).replace(tzinfo=None)
+
+            @classmethod
+            def today(cls):
+                return cls.now()
+
+        class VirtualDate(real_date, metaclass=VirtualType):
+            def __new__(cls, *args, **kwargs):
+                return real_date(*args, **kwargs)
+
+            @classmethod
+            def today(cls):
+                return real_date.fromtimestamp(time.time())
+
+        for cls, original in ((VirtualDateTime, real_datetime), (VirtualDate, real_date)):
+            cls.__module__, cls.__name__, cls.__qualname__ = 'datetime', original.__name__, original.__name__
+
+        virtual_datetime = types.ModuleType('datetime', datetime.__doc__)
+        virtual_datetime.__getattr__ = lambda name: getattr(datetime, name)
+        virtual_datetime.datetime, virtual_datetime.date = VirtualDateTime, VirtualDate
+
+        def virtual_import(*args, **kwargs):
+            module = real_import(*args, **kwargs)
+
+            if module is datetime and clock._is_notebook(sys._getframe(1).f_globals):
+                return virtual_datetime
+            return module
+
+        replacements = {
+            name: virtual_datetime
+            for name, value in self._namespace.items()
+            if value is datetime
+        }
+
+        self._undo = patch(self._namespace, {
+            'time.sleep': sleep,
+            'time.time': lambda: real_time() + clock.offset,
+            'time.time_ns': lambda: real_time_ns() + int(clock.offset * 1e9),
+            'time.monotonic': lambda: real_monotonic() + clock.offset,
+            'time.monotonic_ns': lambda: real_monotonic_ns() + int(clock.offset * 1e9),
+            'time.perf_counter': lambda: real_perf_counter() + clock.offset,
+            'time.perf_counter_ns': lambda: real_perf_counter_ns() + int(clock.offset * 1e9),
+            'asyncio.sleep': asyncio_sleep,
+            'builtins.__import__': virtual_import,
+            **replacements
+        })
+
+        return self
+
+    def uninstall(self):
+        """
+        restore the original functions and modules
+        """
+        if self._undo is not None:
+            unpatch(self._undo)
+            self._undo = None
+
+
+NAMESPACES: Dict[str, Any] = {}
+_BASE: List[Any] = []
+
+
+def _isolated(namespace: Dict[str, Any]) -> bool:
+    return any(namespace is module.__dict__ for module in NAMESPACES.values())
+
+
+def _copy(value: Any, memo: Dict[int, Any]) -> Any:
+    import copy
+
+    try:
+        return copy.deepcopy(value, memo)
+    except Exception:
+        return value
+
+
+def _rebind(value: Any, namespace: Dict[str, Any], values: Dict[str, Any], memo: Dict[int, Any]) -> Any:
+    """
+    copy functions, descriptors, `lru_cache` wrappers and classes using `namespace` as globals
+    (directly, in their closure or as wrapped function) so that the copies use `values` instead
+
+    :param value: value to copy
+    :param namespace: namespace to copy
+    :param values: globals of the copies
+    :param memo: `copy.deepcopy` memo the copies are added to
+    :return: copy or `value` if it does not use `namespace`
+    """
+    import functools
+    import types
+
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, (staticmethod, classmethod)):
+        fun = _rebind(value.__func__, namespace, values, memo)
+        return type(value)(fun) if fun is not value.__func__ else value
+
+    if isinstance(value, property):
+        funs = [_rebind(f, namespace, values, memo) for f in (value.fget, value.fset, value.fdel)]
+        if all(new is old for new, old in zip(funs, (value.fget, value.fset, value.fdel))):
+            return value
+        return property(*funs, value.__doc__)
+
+    if isinstance(value, types.FunctionType):
+        # recursive references keep the original function
+        memo[id(value)] = value
+
+        closure = value.__closure__
+        if closure is not None:
+            cells = []
+            for cell in closure:
+                try:
+                    contents = cell.cell_contents
+                except ValueError:
+                    cells.append(cell)
+                    continue
+
+                new = _rebind(contents, namespace, values, memo)
+                cells.append(types.CellType(new) if new is not contents else cell)
+
+            if all(new is old for new, old in zip(cells, closure)):
+                cells = closure
+            closure = tuple(cells)
+
+        if value.__globals__ is not namespace and closure is value.__closure__:
+            return value
+
+        fun = types.FunctionType(value.__code__, values if value.__globals__ is namespace else value.__globals__,
+                                 value.__name__, _copy(value.__defaults__, memo), closure)
+        fun.__kwdefaults__ = _copy(value.__kwdefaults__, memo)
+        fun.__qualname__, fun.__module__ = value.__qualname__, value.__module__
+        fun.__annotations__, fun.__doc__ = value.__annotations__, value.__doc__
+        memo[id(value)] = fun
+
+        fun.__dict__.update({k: _rebind(v, namespace, values, memo) for k, v in value.__dict__.items()})
+        return fun
+
+    # functions decorated with `lru_cache` get a new, empty cache
+    if hasattr(value, '__wrapped__') and hasattr(value, 'cache_parameters'):
+        wrapped = _rebind(value.__wrapped__, namespace, values, memo)
+        if wrapped is value.__wrapped__:
+            return value
+
+        memo[id(value)] = functools.update_wrapper(functools.lru_cache(**value.cache_parameters())(wrapped), wrapped)
+        return memo[id(value)]
+
+    # classes defined in the notebook are created again, so instances copied later use the new class
+    if isinstance(value, type) and value.__module__ == namespace.get('__name__'):
+        attributes = {k: v for k, v in vars(value).items() if k not in ('__dict__', '__weakref__')}
+        bases = tuple(_rebind(b, namespace, values, memo) for b in value.__bases__)
+
+        try:
+            cls = type(value)(value.__name__, bases, attributes)
+        except Exception:
+            return value
+
+        cls.__qualname__ = value.__qualname__
+        memo[id(value)] = cls
+
+        for name, attribute in attributes.items():
+            new = _rebind(attribute, namespace, values, memo)
+            if new is attribute and not name.startswith('__'):
+                new = _copy(attribute, memo)
+
+            if new is not attribute:
+                try:
+                    setattr(cls, name, new)
+                except (AttributeError, TypeError):
+                    pass
+
+        return cls
+
+    return value
+
+
+def isolate(namespace: Dict[str, Any], key: str):
+    """
+    create a namespace from a copy of another one. Values are deep copied if possible
+    and used as they are otherwise (e.g. modules). Functions, classes and `lru_cache` wrappers
+    defined in the copied namespace are created again using the new one as globals, including
+    methods and wrapped functions. Classes that can not be created again (e.g. enums or classes
+    using `__slots__`) and other wrapper objects keep using the copied namespace.
+
+    :param namespace: namespace to copy, usually `globals()` of the notebook
+    :param key: name used with `enter` and `discard`
+    """
+    import types
+    from IPython import get_ipython
+
+    # names created by IPython like `In`, `Out` or `exit` are shared
+    hidden = getattr(get_ipython(), 'user_ns_hidden', {})
+
+    module = types.ModuleType('__main__')
+    values = module.__dict__
+    memo = {}
+
+    shared = {
+        name
+        for name, value in namespace.items()
+        if name == '__builtins__' or name in hidden and hidden[name] is value
+    }
+
+    # functions and classes are rebound first, so copied values refer to the new ones
+    rebound = {
+        name: _rebind(value, namespace, values, memo)
+        for name, value in namespace.items()
+        if name not in shared
+    }
+
+    for name, value in namespace.items():
+        if name in shared:
+            values[name] = value
+        elif rebound[name] is not value:
+            values[name] = rebound[name]
+        else:
+            values[name] = _copy(value, memo)
+
+    NAMESPACES[key] = module
+
+
+def enter(key: Optional[str]):
+    """
+    execute all following statements, including those of the current cell,
+    in a namespace created by `isolate`
+
+    :param key: namespace name or None for the original namespace of the kernel
+    """
+    import sys
+    from IPython import get_ipython
+
+    shell = get_ipython()
+    if len(_BASE) == 0:
+        _BASE.append(shell.user_module)
+
+    module = NAMESPACES[key] if key is not None else _BASE[0]
+
+    # `__main__` is replaced too, so classes and functions are pickled from the right namespace
+    shell.user_module, shell.user_ns = module, module.__dict__
+    sys.modules['__main__'] = module
+
+
+def discard(key: str):
+    """
+    remove a namespace created by `isolate` and return to the original namespace
+
+    :param key: namespace name
+    """
+    from IPython import get_ipython
+
+    if get_ipython().user_module is NAMESPACES.get(key):
+        enter(None)
+
+    NAMESPACES.pop(key, None)
@@ -0,0 +1,288 @@
+"""
+fork server for Python kernels
+
+This file is executed as a script and must only depend on the standard library
+at module level, so the launcher starts without importing jptest2 itself.
+
+    zygote.py serve <socket> [module ...]
+        import ipykernel and the given modules once, then fork a new kernel
+        for every launcher connecting to the unix socket
+
+    zygote.py launch <socket> [kernel argument ...]
+        ask the zygote listening on the socket for a new kernel, forward
+        signals to it and exit as soon as the kernel exits
+
+Running kernels load this file as a module to fork themselves using
+`fork_kernel`, which accepts a single launcher the same way.
+"""
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import List, Optional
+
+
+def _recv_request(conn: socket.socket):
+    """
+    receive stdio file descriptors and a json encoded request
+
+    :param conn: connection to a launcher
+    :return: tuple of (file descriptors, request)
+    """
+    data, fds, _, _ = socket.recv_fds(conn, 1 << 20, 3)
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(1 << 20)
+        if not chunk:
+            raise EOFError('launcher closed the connection')
+        data += chunk
+
+    return fds, json.loads(data)
+
+
+def _bind_to(conn: socket.socket):
+    """
+    exit this process as soon as the other end of `conn` is closed
+
+    :param conn: connection to a launcher
+    """
+
+    def watch():
+        try:
+            while conn.recv(1024):
+                pass
+        except OSError:
+            pass
+
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def start_kernel(conn: socket.socket, fds: List[int], request: dict, user_ns: Optional[dict] = None):
+    """
+    start an IPython kernel in the current process and never return
+
+    :param conn: connection to the launcher representing this kernel
+    :param fds: stdin, stdout and stderr of the launcher
+    :param request: dict containing argv, cwd and env
+    :param user_ns: namespace to start the kernel with
+    """
+    try:
+        os.setsid()
+    except OSError:
+        pass
+
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = ['ipykernel_launcher', *request['argv']]
+
+    conn.sendall(f'{os.getpid()}\n'.encode('ascii'))
+    _bind_to(conn)
+
+    # trait defaults were evaluated in the zygote's environment
+    argv = list(request['argv'])
+    if 'JPY_PARENT_PID' in os.environ:
+        argv.append(f'--IPKernelApp.parent_handle={os.environ["JPY_PARENT_PID"]}')
+
+    try:
+        from ipykernel.kernelapp import IPKernelApp
+        IPKernelApp.launch_instance(argv=argv, user_ns=user_ns)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+
+
+def serve(path: str, preload: List[str]):
+    """
+    import modules and fork a new kernel for every incoming connection
+
+    :param path: unix socket path to listen on
+    :param preload: modules to import before forking
+    """
+    import importlib
+
+    # same as for kernels started by jupyter_client
+    os.environ.setdefault('PYDEVD_DISABLE_FILE_VALIDATION', '1')
+
+    # modules imported lazily during kernel initialization
+    for module in ('ipykernel.kernelapp', 'ipykernel.ipkernel', 'ipykernel.debugger', 'IPython.core.completerlib',
+                   *preload):
+        importlib.import_module(module)
+
+    # children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(64)
+
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+
+    # exit as soon as the test context closes stdin
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ)
+    sel.register(sys.stdin, selectors.EVENT_READ)
+
+    try:
+        while True:
+            for key, _ in sel.select():
+                if key.fileobj is sys.stdin:
+                    if not sys.stdin.buffer.read1(1024):
+                        return
+                    continue
+
+                conn, _ = server.accept()
+
+                try:
+                    fds, request = _recv_request(conn)
+                except (OSError, EOFError, ValueError):
+                    conn.close()
+                    continue
+
+                if os.fork() == 0:
+                    sel.close()
+                    server.close()
+                    start_kernel(conn, fds, request)
+
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def fork_kernel(path: str, timeout: float) -> int:
+    """
+    fork the running kernel for the next launcher connecting to `path`.
+    The child keeps the user namespace and replaces the kernel application
+    including all sockets and threads with a new one.
+
+    :param path: unix socket path to listen on
+    :param timeout: seconds to wait for the launcher
+    :return: pid of the child process
+    """
+    import asyncio
+    from IPython import get_ipython
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    server.settimeout(timeout)
+
+    try:
+        conn, _ = server.accept()
+        conn.settimeout(None)
+        fds, request = _recv_request(conn)
+    finally:
+        server.close()
+        os.unlink(path)
+
+    from ipykernel.kernelapp import IPKernelApp
+
+    app = IPKernelApp.instance()
+    shell = get_ipython()
+    pid = os.fork()
+
+    if pid == 0:
+        # threads, sockets and event loops of the parent kernel are unusable
+        # after forking and must not be touched again
+        for cls in (type(app), type(app.kernel), type(shell)):
+            cls.clear_instance()
+
+        # noinspection PyUnresolvedReferences,PyProtectedMember
+        asyncio.events._set_running_loop(None)
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        start_kernel(conn, fds, request, shell.user_ns)
+
+    for fd in fds:
+        os.close(fd)
+    conn.close()
+
+    return pid
+
+
+def launch(path: str, argv: List[str]) -> int:
+    """
+    request a kernel from a zygote and wait for it to exit
+
+    :param path: unix socket path of the zygote
+    :param argv: kernel arguments
+    :return: exit code
+    """
+    # a forking kernel may not listen yet
+    for attempt in range(1000):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(path)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            conn.close()
+            if attempt == 999:
+                raise
+            time.sleep(0.01)
+
+    request = json.dumps({
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ)
+    }).encode('utf-8') + b'\n'
+    socket.send_fds(conn, [request], [0, 1, 2])
+
+    pid_line = b''
+    while not pid_line.endswith(b'\n'):
+        chunk = conn.recv(64)
+        if not chunk:
+            return 1
+        pid_line += chunk
+
+    pid = int(pid_line)
+
+    # forward signals sent by the kernel manager
+    def forward(signum, _):
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+
+    for s in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT, signal.SIGUSR1, signal.SIGUSR2):
+        signal.signal(s, forward)
+
+    # the kernel closes its end of the connection on exit
+    while True:
+        try:
+            if not conn.recv(1024):
+                return 0
+        except InterruptedError:
+            continue
+        except OSError:
+            return 1
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == 'serve':
+        serve(sys.argv[2], sys.argv[3:])
+    elif sys.argv[1] == 'launch':
+        sys.exit(launch(sys.argv[2], sys.argv[3:]))
+    else:
+        raise ValueError(f'unknown command {sys.argv[1]}')
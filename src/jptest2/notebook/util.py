@@ -1,5 +1,22 @@
+import asyncio
+import inspect
+import os
+import textwrap
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from os import PathLike
+from typing import Optional, Callable, TypeVar, Union, Tuple
 from uuid import uuid4
 
+import nbformat
+from nbformat import NotebookNode
+
+T = TypeVar('T')
+
+CPU_EXECUTOR: Optional[Executor] = None
+CPU_EXECUTOR_WORKERS: int = os.cpu_count() or 4
+OFFLOAD_THRESHOLD: int = 256 * 1024
+
 
 # randomize name
 def randomize_name(name: str) -> str:
@@ -13,3 +30,100 @@ def randomize_name(name: str) -> str:
     random_id = str(uuid4()).replace('-', '_')
 
     return f'_{name}_{random_id}'
+
+
+# function sources
+def function_source(fun: Callable) -> Tuple[str, str]:
+    """
+    get the dedented source of a function and the name it is assigned to
+
+    :param fun: function defined using `def` or assigned lambda
+    :return: tuple of source and name
+    """
+    source = textwrap.dedent(inspect.getsource(fun))
+
+    name = fun.__name__
+    if name == '<lambda>':
+        name = source.split('=')[0].strip()
+
+    return source, name
+
+
+# sql statements
+def strip_statement(statement: str) -> str:
+    """
+    remove surrounding whitespace and trailing semicolons
+
+    :param statement: sql statement
+    :return: statement usable as subquery
+    """
+    return statement.strip().rstrip(';').strip()
+
+
+# cpu bound work
+def cpu_executor() -> Executor:
+    """
+    get the executor used by `run_cpu` (default: thread pool with one worker per cpu)
+
+    :return: Executor
+    """
+    global CPU_EXECUTOR
+
+    if CPU_EXECUTOR is None:
+        CPU_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix='jptest_cpu')
+
+    return CPU_EXECUTOR
+
+
+def set_cpu_executor(executor: Optional[Executor]):
+    """
+    replace the executor used by `run_cpu`, e.g. by a `ProcessPoolExecutor`.
+    The previous executor is shut down.
+
+    :param executor: new executor or None to use the default
+    """
+    global CPU_EXECUTOR
+
+    if CPU_EXECUTOR is not None and CPU_EXECUTOR is not executor:
+        CPU_EXECUTOR.shutdown(wait=False)
+
+    CPU_EXECUTOR = executor
+
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    run a cpu bound function in the cpu executor to keep the event loop responsive.
+    Functions and arguments have to be picklable if a process pool is used.
+
+    :param fn: function
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :return: return value of `fn`
+    """
+    return await asyncio.get_event_loop().run_in_executor(cpu_executor(), partial(fn, *args, **kwargs))
+
+
+async def offload(size: int, fn: Callable[..., T], *args) -> T:
+    """
+    run a function processing in-memory data in the cpu executor if the data is large
+    and the executor is a thread pool. Process pools would copy the data twice.
+
+    :param size: size of the data in bytes
+    :param fn: function
+    :param args: positional arguments
+    :return: return value of `fn`
+    """
+    if size < OFFLOAD_THRESHOLD or not isinstance(cpu_executor(), ThreadPoolExecutor):
+        return fn(*args)
+
+    return await run_cpu(fn, *args)
+
+
+async def read_notebook(path: Union[str, PathLike]) -> NotebookNode:
+    """
+    parse and validate a notebook file in the cpu executor
+
+    :param path: notebook path
+    :return: NotebookNode
+    """
+    return await run_cpu(nbformat.read, path, as_version=4)
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from jptest2 import JPTestComparison
+
+
+@pytest.mark.asyncio
+async def test_cache_right(tmp_path):
+    JPTestComparison.CACHE_DIR = str(tmp_path)
+    JPTestComparison.CACHE = {}
+
+    received = []
+
+    async def fun(left, right):
+        received.append((left, right))
+        yield left == right, 1
+
+    def test():
+        t = JPTestComparison(max_score=1, execute_left='x = 6 * 7', hold_left='x',
+                             execute_right='y = 42', hold_right='y')
+        t._fun = fun
+
+        # count started kernels
+        starts = []
+        start = t._start
+
+        def counting_start(notebook, template=None):
+            starts.append(notebook)
+            return start(notebook, template)
+
+        t._start = counting_start
+        return t, starts
+
+    try:
+        # miss
+        t, starts = test()
+        assert await t.execute('references.ipynb') == (1, [], None)
+        assert len(starts) == 2
+        assert len(os.listdir(tmp_path)) == 1
+
+        # hit in the same run
+        t, starts = test()
+        assert await t.execute('references.ipynb') == (1, [], None)
+        assert len(starts) == 1
+
+        # hit in a later run
+        JPTestComparison.CACHE = {}
+
+        t, starts = test()
+        assert await t.execute('references.ipynb') == (1, [], None)
+        assert len(starts) == 1
+
+        # different items
+        JPTestComparison.CACHE = {}
+
+        t, starts = test()
+        t._execute_right = 'y = 41'
+        assert (await t.execute('references.ipynb'))[0] == 0
+        assert len(starts) == 2
+        assert len(os.listdir(tmp_path)) == 2
+
+        assert received == [(42, 42)] * 3 + [(42, 41)]
+
+        # failed computations are not cached
+        JPTestComparison.CACHE = {}
+
+        t, starts = test()
+        t._execute_right = 'raise ValueError("failed")'
+        score, comments, e = await t.execute('references.ipynb')
+        assert score == 0 and e is not None
+        assert len(JPTestComparison.CACHE) == 0
+        assert len(os.listdir(tmp_path)) == 2
+
+    finally:
+        JPTestComparison.CACHE_DIR = None
+        JPTestComparison.CACHE = {}
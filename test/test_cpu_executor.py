@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from jptest2 import PythonNotebook, run_cpu
+from jptest2.notebook import util
+
+
+def thread_name(*args, **kwargs):
+    return threading.current_thread().name, args, kwargs
+
+
+@pytest.mark.asyncio
+async def test_run_cpu():
+    name, args, kwargs = await run_cpu(thread_name, 1, 2, key='value')
+    assert name.startswith('jptest_cpu')
+    assert args == (1, 2) and kwargs == {'key': 'value'}
+
+    # small data is processed on the event loop
+    name, _, _ = await util.offload(10, thread_name)
+    assert name == threading.current_thread().name
+
+    name, _, _ = await util.offload(util.OFFLOAD_THRESHOLD, thread_name)
+    assert name.startswith('jptest_cpu')
+
+    # custom executor
+    try:
+        util.set_cpu_executor(ThreadPoolExecutor(max_workers=1, thread_name_prefix='custom'))
+        name, _, _ = await run_cpu(thread_name)
+        assert name.startswith('custom')
+    finally:
+        util.set_cpu_executor(None)
+
+
+@pytest.mark.asyncio
+async def test_offloaded_transfer():
+    nb = await util.read_notebook('references.ipynb')
+    assert len(nb.cells) > 0
+
+    async with PythonNotebook(nb) as nb:
+        await nb.execute_code('large = list(range(200_000))')
+
+        # other tasks keep running while large values are decoded
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.ensure_future(tick())
+        try:
+            assert await nb.ref('large').receive() == list(range(200_000))
+        finally:
+            ticker.cancel()
+
+        assert ticks > 0
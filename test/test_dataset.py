@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from jptest2 import JPDataset, PythonNotebook
+
+
+@pytest.mark.asyncio
+async def test_dataset(tmp_path):
+    csv_path = os.path.join(tmp_path, 'dataset.csv')
+    pd.DataFrame({'a': range(100), 'b': [i / 2 for i in range(100)], 'c': ['x', 'y'] * 50}).to_csv(csv_path, index=False)
+
+    try:
+        JPDataset(csv_path)
+
+        @JPDataset(os.path.join(tmp_path, 'custom.csv'), patch_read_csv=False)
+        def load_custom():
+            return pd.DataFrame({'d': [1, 2, 3]})
+
+        await JPDataset.prepare()
+        served = JPDataset.served()
+        assert len(served) == 2
+
+        # changes to the file after loading are not visible to kernels
+        pd.DataFrame({'a': [-1]}).to_csv(csv_path, index=False)
+
+        async with PythonNotebook('functions.ipynb', datasets=served) as nb:
+            await nb.execute_code(f'''
+                import pandas as pd
+
+                df = pd.read_csv({csv_path!r})
+                df.loc[0, 'a'] = 1000
+                df['e'] = df['a'] * 2
+            ''')
+
+            df = await nb.ref('df').receive()
+            assert len(df) == 100 and df['a'][0] == 1000 and df['e'][1] == 2
+
+            # writes are not visible to other reads
+            assert await nb.ref(f'pd.read_csv({csv_path!r})["a"][0]').receive() == 0
+
+            # other keyword arguments read the file
+            assert await nb.ref(f'len(pd.read_csv({csv_path!r}, sep=","))').receive() == 1
+
+            # datasets are accessible without patching
+            assert (await nb.ref(f'''__import__('_jptest').dataset({os.path.join(tmp_path, 'custom.csv')!r})''')
+                    .receive())['d'].tolist() == [1, 2, 3]
+    finally:
+        JPDataset.remove_cache()
+        JPDataset.DATASETS = {}
+
+    assert all(not os.path.exists(path) for path, _ in served.values())
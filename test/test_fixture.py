@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from jptest2 import JPTest, JPFixture, ZygoteKernelProvider
+
+
+async def run_tests(fixture: JPFixture, count: int, fun) -> list:
+    JPTest.TESTS, tests = {}, JPTest.TESTS
+
+    try:
+        for i in range(count):
+            JPTest(f'test {i % 2}', max_score=1, fixture=fixture)(fun)
+
+        results = await asyncio.gather(*[t.execute('references.ipynb') for ts in JPTest.TESTS.values() for t in ts])
+        for _, comments, e in results:
+            assert e is None, comments
+
+        return results
+    finally:
+        JPTest.TESTS = tests
+        await JPFixture.close_all()
+
+
+@pytest.mark.asyncio
+async def test_shared_fixture():
+    notebooks, pids = [], []
+
+    @JPFixture(scope='run', execute='import os')
+    async def prepared(nb):
+        await nb.execute_code('value = 42')
+
+    async def fun(nb):
+        notebooks.append(nb)
+        pids.append(await nb.ref('os.getpid()').receive())
+        yield await nb.ref('value').receive() == 42, 1
+
+    await run_tests(prepared, 4, fun)
+
+    # all tests use the same notebook, which is stopped after the last test
+    assert len(set(pids)) == 1
+    assert notebooks[0]._nc.kc is None
+
+    # one notebook per test name
+    pids.clear()
+    prepared.scope = 'name'
+    await run_tests(prepared, 4, fun)
+    assert len(set(pids)) == 2
+
+    # one notebook per test
+    pids.clear()
+    prepared.scope = 'test'
+    await run_tests(prepared, 4, fun)
+    assert len(set(pids)) == 4
+
+
+@pytest.mark.asyncio
+async def test_serialized_fixture():
+    active, max_active = 0, 0
+
+    async def fun(nb):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+
+        await nb.execute_code('value += 1')
+        yield True, 1
+
+        active -= 1
+
+    await run_tests(JPFixture(access='serialized', execute='value = 0'), 4, fun)
+    assert max_active == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not ZygoteKernelProvider.supported(), reason='forking is not supported')
+async def test_forked_fixture():
+    values = []
+
+    async def fun(nb):
+        await nb.execute_code('value += 1')
+        values.append(await nb.ref('value').receive())
+        yield True, 1
+
+    # every test modifies its own fork
+    await run_tests(JPFixture(access='fork', execute='value = 0'), 3, fun)
+    assert values == [1, 1, 1]
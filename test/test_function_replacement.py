@@ -98,3 +98,87 @@ async def test_replace_object_function():
 
             result_b = await nb.ref('b').fun().receive()
             assert result_b == 5
+
+
+@pytest.mark.asyncio
+async def test_runtime_operations():
+    def local_fun(_, b):
+        return b
+
+    async with PythonNotebook('functions.ipynb') as nb:
+        # the runtime is loaded at startup without adding a cell
+        cell_count = len(nb.cells)
+        assert await nb.ref('__import__("sys").modules["_jptest"].__name__').receive() == '_jptest'
+        assert len(nb.cells) == cell_count + 1
+
+        await nb.execute_cells('definition')
+
+        # replacing and tracking need a single cell each
+        cell_count = len(nb.cells)
+        async with nb.replace_fun('nb_fun', local_fun), nb.track_fun('nb_fun', 'b') as track:
+            assert len(nb.cells) == cell_count + 2
+            await nb.execute_cells('store')
+
+        assert len((await track.receive())) == 1
+
+        # the replacement is not defined under its own name
+        assert not await nb.ref('"local_fun" in globals()').receive()
+        assert await nb.ref('result').receive() == 110
+
+
+@pytest.mark.asyncio
+async def test_patch():
+    def sleep(_):
+        return 'slept'
+
+    def ceil(_):
+        return 'outer'
+
+    def inner_ceil(_):
+        return 'inner'
+
+    def one():
+        return 1
+
+    async with PythonNotebook('functions.ipynb') as nb:
+        await nb.execute_code('''
+            import math
+
+            class Test:
+                def fun(self):
+                    return 5
+
+            a = Test()
+        ''')
+
+        # many replacements including modules not imported in the notebook in a single cell each
+        cell_count = len(nb.cells)
+        async with nb.patch({'time.sleep': sleep, 'math.ceil': ceil, 'a.fun': one, 'limit': 10}):
+            assert len(nb.cells) == cell_count + 1
+
+            assert await nb.ref('__import__("time").sleep(100)').receive() == 'slept'
+            assert await nb.ref('math.ceil(1.5)').receive() == 'outer'
+            assert await nb.ref('a.fun()').receive() == 1
+            assert await nb.ref('limit').receive() == 10
+
+            # nested patches are restored in reverse order
+            async with nb.patch({'math.ceil': inner_ceil}):
+                assert await nb.ref('math.ceil(1.5)').receive() == 'inner'
+
+            assert await nb.ref('math.ceil(1.5)').receive() == 'outer'
+
+        assert len(nb.cells) == cell_count + 10
+
+        # originals are restored and new names are removed
+        assert await nb.ref('math.ceil(1.5)').receive() == 2
+        assert await nb.ref('a.fun()').receive() == 5
+        assert await nb.ref('"fun" in vars(a)').receive() is False
+        assert await nb.ref('"limit" in globals()').receive() is False
+        assert await nb.ref('__import__("time").sleep.__name__').receive() == 'sleep'
+
+        # failing patches are rolled back
+        with pytest.raises(Exception):
+            async with nb.patch({'math.floor': ceil, 'missing.fun': ceil}):
+                pass
+
+        assert await nb.ref('math.floor(1.5)').receive() == 1
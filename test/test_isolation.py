@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from jptest2 import JPTest
+from jptest2.notebook.NotebookError import NotebookError
+from jptest2.notebook.kernels import PythonNotebook
+
+
+@pytest.mark.asyncio
+async def test_isolate():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            import os
+
+            items = [1, 2]
+            counter = 0
+
+            def increment():
+                global counter
+                counter += 1
+                return counter
+        ''')
+
+        async with await nb.isolate() as first, await nb.isolate() as second:
+            # variables are copied, functions use the copy
+            await first.execute_code('items.append(3)')
+            assert await first.ref('increment')().receive() == 1
+            assert await first.ref('increment')().receive() == 2
+
+            assert await second.ref('items').receive() == [1, 2]
+            assert await second.ref('increment')().receive() == 1
+
+            # stored values and new variables are only visible in their namespace
+            await first.store(42, 'value')
+            await second.execute_code('value = 0')
+            assert await first.ref('value').receive() == 42
+            assert await second.ref('value').receive() == 0
+
+            # the same kernel is used
+            assert await first.ref('os.getpid()').receive() == await second.ref('os.getpid()').receive()
+
+        # the prepared namespace is not modified
+        assert await nb.ref('items').receive() == [1, 2]
+        assert await nb.ref('counter').receive() == 0
+        assert not await nb.ref("'value' in globals()").receive()
+
+
+@pytest.mark.asyncio
+async def test_isolate_classes():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            import enum
+            import functools
+
+            counter = [0]
+
+            class A:
+                def get(self):
+                    counter[0] += 1
+                    return counter[0]
+
+            class B(A):
+                def get(self):
+                    return super().get() * 10
+
+            class Color(enum.Enum):
+                RED = 1
+
+                def count(self):
+                    counter[0] += 1
+                    return counter[0]
+
+            def logged(fun):
+                @functools.wraps(fun)
+                def wrapper(*args):
+                    return fun(*args)
+                return wrapper
+
+            @functools.lru_cache(maxsize=None)
+            def cached(x):
+                counter[0] += x
+                return counter[0]
+
+            @logged
+            def decorated():
+                counter[0] += 1
+                return counter[0]
+
+            b = B()
+        ''')
+
+        async with await nb.isolate() as first:
+            await first.execute_code('counter[0] = 10')
+
+            # methods, existing instances and wrapped functions use the copy
+            assert await first.ref('A().get()').receive() == 11
+            assert await first.ref('b.get()').receive() == 120
+            assert await first.ref('isinstance(b, A)').receive()
+            assert await first.ref('cached(1)').receive() == 13
+            assert await first.ref('decorated()').receive() == 14
+
+            # enums can not be created again and still use the prepared namespace
+            assert await first.ref('Color.RED.count()').receive() == 1
+
+        async with await nb.isolate() as second:
+            # caches are not shared
+            assert await second.ref('cached(1)').receive() == 2
+
+        assert await nb.ref('counter').receive() == [1]
+        assert await nb.ref('cached.cache_info().currsize').receive() == 0
+
+        # failed switches are reported and the next request switches again
+        third = await nb.isolate()
+        await nb.execute_code(f"__import__('_jptest').discard({third._namespace!r})")
+
+        with pytest.raises(NotebookError):
+            await third.execute_code('counter[0] = 20')
+
+        assert await nb.ref('counter').receive() == [1]
+
+
+@pytest.mark.asyncio
+async def test_isolated_tests():
+    pids, values = [], []
+
+    async def fun(nb):
+        await nb.execute_code('value += 1')
+        pids.append(await nb.ref('os.getpid()').receive())
+        values.append(await nb.ref('value').receive())
+        yield True, 1
+
+    JPTest.TESTS, tests = {}, JPTest.TESTS
+
+    try:
+        for i in range(4):
+            JPTest(f'test {i}', max_score=1, execute='import os\nvalue = 0', isolated=True)(fun)
+
+        results = await asyncio.gather(*[t.execute('references.ipynb') for ts in JPTest.TESTS.values() for t in ts])
+        for _, comments, e in results:
+            assert e is None, comments
+    finally:
+        JPTest.TESTS = tests
+        await JPTest.close_shared()
+
+    # all tests share one kernel, which is stopped after the last test
+    assert len(set(pids)) == 1
+    assert values == [1, 1, 1, 1]
+    assert len(JPTest.SHARED) == 0
+
+    with pytest.raises(ValueError):
+        JPTest(isolated=True, prepare_second=True)
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from jptest2 import PythonNotebook, NotebookGroup, Payload
+
+
+@pytest.mark.asyncio
+async def test_group_calls():
+    async with NotebookGroup([PythonNotebook('references.ipynb') for _ in range(3)]) as group:
+        await group.execute_code('''
+            import os
+
+            def square_with_pid(i):
+                return i * i, os.getpid()
+        ''')
+
+        results = await asyncio.gather(*[group.ref('square_with_pid')(i) for i in range(30)])
+
+        # results are returned in call order
+        assert [r for r, _ in results] == [i * i for i in range(30)]
+
+        # calls are distributed over all replicas
+        assert len(set(pid for _, pid in results)) == 3
+
+        # attributes and values
+        assert await group.ref('os').path.join('a', 'b') == 'a/b'
+        assert await group.os.sep == '/'
+
+
+@pytest.mark.asyncio
+async def test_group_start_failure():
+    class FailingNotebook:
+        async def __aenter__(self):
+            await asyncio.sleep(0.5)
+            raise RuntimeError('start failed')
+
+    notebooks = [PythonNotebook('references.ipynb') for _ in range(2)]
+
+    with pytest.raises(RuntimeError):
+        async with NotebookGroup([*notebooks, FailingNotebook()]):
+            pass
+
+    # replicas that did start are stopped
+    assert all(nb._nc.kc is None for nb in notebooks)
+
+
+@pytest.mark.asyncio
+async def test_broadcast(monkeypatch):
+    module = sys.modules['jptest2.notebook.Payload']
+    dumps = []
+
+    def counting_dump(value, path):
+        dumps.append(path)
+        return original_dump(value, path)
+
+    original_dump = module._dump
+    monkeypatch.setattr(module, '_dump', counting_dump)
+
+    expected = Payload({'values': list(range(1000))})
+
+    async with NotebookGroup([PythonNotebook('references.ipynb') for _ in range(3)]) as group:
+        # a payload is pickled once for all current and later notebooks
+        await group.store(expected, 'expected')
+        assert (await group.ref('expected'))['values'][999] == 999
+
+        async with PythonNotebook('references.ipynb') as nb:
+            ref = await nb.store(expected)
+            assert await ref['values'][10] == 10
+
+        assert len(dumps) == 1
+
+        # values are pickled once per broadcast and removed afterwards
+        refs = await PythonNotebook.broadcast([1, 2, 3], 'numbers', group.notebooks)
+        assert await asyncio.gather(*[r.receive() for r in refs]) == [[1, 2, 3]] * 3
+        assert len(dumps) == 2 and not os.path.exists(dumps[1])
+
+    expected.remove()
+    assert not os.path.exists(dumps[0])
+
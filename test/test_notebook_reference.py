@@ -1,8 +1,9 @@
 import asyncio
+import sys
 
 import pytest
 
-from jptest2 import PythonNotebook
+from jptest2 import PythonNotebook, digest
 
 
 @pytest.mark.asyncio
@@ -176,3 +177,275 @@ async def test_transfer_between_notebooks():
 
         result = await nb1_fun(nb1_a, nb2_int).receive()
         assert result == (await nb2_int.receive(), await nb1_a.receive())
+
+
+@pytest.mark.asyncio
+async def test_map():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            def div(a, b=1):
+                return a // b
+        ''')
+
+        # single arguments and tuples
+        result = await nb.ref('div').map([1, 2, (3, 0), (4, 2)])
+        assert result[:2] == [1, 2]
+        assert isinstance(result[2], ZeroDivisionError)
+        assert result[3] == 2
+
+        # keyword arguments
+        result = await nb.ref('div').map([4, 4], [{'b': 2}, {'b': 4}])
+        assert result == [2, 1]
+
+        # raise exceptions
+        with pytest.raises(Exception):
+            await nb.ref('div').map([(1, 0)], return_exceptions=False)
+
+
+@pytest.mark.asyncio
+async def test_map_vectorize():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            def square(x):
+                return x * x
+
+            def total(x):
+                return x.sum()
+
+            def div(a, b=1):
+                return a // b
+        ''')
+
+        assert await nb.ref('square').map([1, 2, 3], vectorize=True) == [1, 4, 9]
+
+        # tuples are passed as one array per parameter
+        assert await nb.ref('div').map([(4, 2), (9, 3)], vectorize=True) == [2, 3]
+        assert await nb.ref('div').map([(4, 2), (9,)], vectorize=True) == [2, 9]
+
+        # results without one row per input fall back to single calls
+        assert await nb.ref('str').map([1, 2, 3], vectorize=True) == ['1', '2', '3']
+        assert await nb.ref('len').map(['ab', 'c'], vectorize=True) == [2, 1]
+
+        result = await nb.ref('total').map([1, 2, 3], vectorize=True)
+        assert all(isinstance(r, AttributeError) for r in result)
+
+
+def test_map_vectorize_without_numpy(monkeypatch):
+    from jptest2.notebook.kernels import runtime
+
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    assert runtime.map(lambda x: x * 2, [1, 2], None, True, True) == [2, 4]
+
+
+@pytest.mark.asyncio
+async def test_matches():
+    import numpy as np
+    import pandas as pd
+
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            import numpy as np
+            import pandas as pd
+
+            df = pd.DataFrame({'a': [3, 1, 2], 'b': [0.3, 0.1, 0.2000001]})
+            arr = np.arange(12).reshape(4, 3) / 10
+            items = [3, 1, 2]
+        ''')
+
+        # frames
+        expected = pd.DataFrame({'a': [1, 2, 3], 'b': [0.1, 0.2, 0.3]})
+        assert not await nb.ref('df').matches(expected)
+        assert await nb.ref('df').matches(expected, check_order=False)
+        assert await nb.ref('df').matches(expected[['b', 'a']], check_order=False)
+
+        result = await nb.ref('df').matches(expected.assign(b=[0.1, 0.25, 0.3]), check_order=False)
+        assert not result and 'b' in result.message
+
+        # the expected value is stored only once
+        assert len(nb._stored_once) == 3
+        await nb.ref('df').matches(expected, check_order=False)
+        assert len(nb._stored_once) == 3
+
+        # arrays
+        assert await nb.ref('arr').matches(np.arange(12).reshape(4, 3) / 10 + 1e-9)
+        assert await nb.ref('arr').matches(np.arange(12).reshape(4, 3)[::-1] / 10, check_order=False)
+
+        result = await nb.ref('arr').matches(np.zeros((4, 3)), sample=2)
+        assert not result and result.message.startswith('11 of 12 values differ')
+
+        result = await nb.ref('arr').matches(np.zeros(3))
+        assert not result and 'shape' in result.message
+
+        # other values and references
+        assert await nb.ref('items').matches([1, 2, 3], check_order=False)
+        assert not await nb.ref('items').matches([1, 2, 3])
+        assert await nb.ref('items')[0].matches(3.0000001)
+        assert await nb.ref('items')[1].matches(nb.ref('items')[1])
+
+
+@pytest.mark.asyncio
+async def test_check():
+    def integers(rng):
+        return rng.randint(-1000, 1000)
+
+    def pairs(rng):
+        return rng.randint(-20, 20), rng.randint(-5, 5)
+
+    def absolute(x):
+        return abs(x)
+
+    def divide(a, b):
+        return a // b
+
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_code('''
+            def absolute(x):
+                return x if x > 0 else -x
+
+            def broken_absolute(x):
+                return x if x > 10 else -x
+
+            def divide(a, b):
+                return a // b if b != 0 else 0
+
+            def square(x):
+                return x * x
+        ''')
+
+        result = await nb.ref('absolute').check(absolute, integers, cases=5000)
+        assert result and result.cases == 5000
+
+        # only the smallest failing inputs are received
+        result = await nb.ref('broken_absolute').check(absolute, integers, cases=5000, examples=2)
+        assert not result and 0 < result.failed < 5000
+        assert len(result.examples) == 2
+        assert all(0 < args[0] <= 10 for args, _ in result.examples)
+
+        # exceptions are compared by type
+        result = await nb.ref('divide').check(divide, pairs)
+        assert not result
+        assert all(args[1] == 0 and 'ZeroDivisionError' in message for args, message in result.examples)
+
+        # the same seed generates the same inputs
+        other = await nb.ref('divide').check(divide, pairs)
+        assert other.failed == result.failed and other.examples == result.examples
+
+        # vectorized calls and references from the notebook context
+        result = await nb.ref('square').check(nb.ref('absolute'), integers, vectorize=True)
+        assert not result and all(abs(args[0]) > 1 for args, _ in result.examples)
+        result = await nb.ref('square').check(nb.ref('square'), integers, cases=10000, vectorize=True)
+        assert result and result.cases == 10000
+
+
+@pytest.mark.asyncio
+async def test_digest():
+    import numpy as np
+    import pandas as pd
+
+    code = '''
+        import numpy as np
+        import pandas as pd
+
+        values = {
+            'primitives': [None, True, 1, 1.5, 'text', b'bytes'],
+            'set': {3, 1, 2},
+            'array': np.arange(6).reshape(2, 3),
+            'df': pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}, index=[5, 6])
+        }
+    '''
+
+    async with PythonNotebook('references.ipynb') as left, PythonNotebook('references.ipynb') as right:
+        await asyncio.gather(left.execute_code(code), right.execute_code(code.replace('{3, 1, 2}', '{1, 2, 3}')))
+
+        # equal in both notebooks and in the test context
+        for key in ('primitives', 'set', 'array', 'df'):
+            assert await left.values[key].digest() == await right.values[key].digest()
+
+        assert await left.values.digest() == await right.values.digest() == digest(await left.values)
+
+        assert await left.values['array'].digest() == digest(np.arange(6).reshape(2, 3))
+        assert await left.values['df'].digest() == digest(pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}))
+
+        # different values
+        await right.execute_code('values["array"][0, 0] = 10')
+        assert await left.values['array'].digest() != await right.values['array'].digest()
+
+    assert digest([1, 2]) != digest([2, 1])
+    assert digest([1, 2]) != digest((1, 2))
+    assert digest({'a': 1, 'b': 2}) == digest({'b': 2, 'a': 1})
+    assert digest(np.arange(3)) != digest(np.arange(3).astype(float))
+
+
+@pytest.mark.asyncio
+async def test_direct_transfer(monkeypatch):
+    import os
+    from jptest2.notebook import NotebookReference
+
+    received = []
+    receive = NotebookReference.receive
+
+    async def tracking_receive(self, deserialize=True):
+        received.append(deserialize)
+        return await receive(self, deserialize)
+
+    monkeypatch.setattr(NotebookReference, 'receive', tracking_receive)
+
+    def transfer_files():
+        return [f for f in os.listdir(PythonNotebook.transfer_dir()) if f.startswith('jptest_')]
+
+    files = transfer_files()
+
+    async with \
+            PythonNotebook('references.ipynb') as nb1, \
+            PythonNotebook('references.ipynb') as nb2:
+        await nb2.execute_code('''
+            import numpy as np
+            large = np.arange(1_000_000)
+            fun = lambda: None
+        ''')
+
+        ref = await nb1.store(nb2.ref('large'))
+        assert await nb1.ref('int')(ref.sum()).receive() == sum(range(1_000_000))
+
+        # the pickled object is not transferred through the test context
+        assert False not in received
+
+        # errors are raised and files are removed
+        with pytest.raises(Exception):
+            await nb1.store(nb2.ref('fun'))
+
+        assert transfer_files() == files
+
+
+@pytest.mark.asyncio
+async def test_compression():
+    import pandas as pd
+
+    async with PythonNotebook('references.ipynb') as nb:
+        # small values are not compressed
+        await nb.store([1, 2, 3], 'small')
+        assert await nb.ref('small').receive() == [1, 2, 3]
+        assert nb.transfer_stats.codecs == {'raw': 2}
+
+        # large values are compressed in both directions
+        df = pd.DataFrame({'label': ['repeated text'] * 100_000, 'value': range(100_000)})
+        await nb.store(df, 'df')
+        assert (await nb.ref('df').receive()).equals(df)
+
+        codec = nb._codecs[0]
+        assert nb.transfer_stats.codecs == {'raw': 2, codec: 2}
+        assert nb.transfer_stats.ratio > 5
+        assert nb.transfer_stats.time > 0
+
+        # incompressible values are not compressed
+        await nb.execute_code('''
+            import os
+            random = os.urandom(1_000_000)
+        ''')
+        assert len(await nb.ref('random').receive()) == 1_000_000
+        assert nb.transfer_stats.codecs == {'raw': 3, codec: 2}
+
+        # inputs of `map` are transferred the same way
+        texts = [f'{i:05} repeated text' * 10 for i in range(10_000)]
+        assert await nb.ref('len').map(texts) == [len(t) for t in texts]
+        assert nb.transfer_stats.codecs == {'raw': 4, codec: 3}
@@ -0,0 +1,72 @@
+import pytest
+
+from jptest2 import JPTest
+
+
+@pytest.mark.asyncio
+async def test_params():
+    pids = []
+
+    async def fun(nb, i, expected=None):
+        pids.append(await nb.ref('__import__("os").getpid()').receive())
+        yield await nb.ref('nb_fun')(i) == expected, 1
+
+    async def failing(nb, i):
+        assert i != 2
+        yield True, 1
+
+    try:
+        # every case uses the same notebook and is reported separately
+        test = JPTest('sum', max_score=1, execute=('definition',), params=[(1, 1), (2, 2), {'i': 3, 'expected': 0}])
+        test(fun)
+
+        results = await test.execute_cases('functions.ipynb')
+        assert [(name, max_score, score) for name, max_score, score, _, _ in results] == [
+            ('sum [(1, 1)]', 1.0, 1.0),
+            ('sum [(2, 2)]', 1.0, 1.0),
+            ("sum [{'i': 3, 'expected': 0}]", 1.0, 0.0)
+        ]
+        assert len(set(pids)) == 1
+
+        # failing cases do not affect others
+        test = JPTest('fail', max_score=1, params=[1, 2, 3], ids=['one', 'two', 'three'])
+        test(failing)
+
+        results = await test.execute_cases('functions.ipynb')
+        assert [(name, score, e is None) for name, _, score, _, e in results] == [
+            ('fail [one]', 1.0, True),
+            ('fail [two]', 0.0, False),
+            ('fail [three]', 1.0, True)
+        ]
+
+        # cases do not see variables changed by previous cases
+        async def increment(*notebooks, i):
+            for nb in notebooks:
+                await nb.execute_code(f'counter += {i}')
+                yield await nb.ref('counter').receive() == i, 1
+
+        test = JPTest('second', max_score=2, execute='counter = 0', prepare_second=True, params=[{'i': 1}, {'i': 2}])
+        test(increment)
+
+        results = await test.execute_cases('functions.ipynb')
+        assert [score for _, _, score, _, _ in results] == [2.0, 2.0]
+
+        test = JPTest('isolated', max_score=1, execute='counter = 0', isolated=True, params=[{'i': 1}, {'i': 2}])
+        test(increment)
+
+        results = await test.execute_cases('functions.ipynb')
+        assert [score for _, _, score, _, _ in results] == [1.0, 1.0]
+
+        # tests without params return a single row
+        test = JPTest('single', max_score=1)
+        test(lambda nb: failing(nb, 1))
+
+        assert [row[:3] for row in await test.execute_cases('functions.ipynb')] == [('single', 1.0, 1.0)]
+    finally:
+        for name in ('sum', 'fail', 'second', 'isolated', 'single'):
+            JPTest.TESTS.pop(name, None)
+
+        await JPTest.close_shared()
+
+    with pytest.raises(ValueError):
+        JPTest('ids', params=[1, 2], ids=['one'])
@@ -65,3 +65,47 @@ async def test_get():
             'b': 2
         }
         assert await nb_swap(a, b).receive() == ('b', 'a')
+
+
+@pytest.mark.asyncio
+async def test_release():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_cells('create')
+
+        def count():
+            return nb.ref("len([n for n in globals() if n.startswith('_stored_') or n.startswith('_a_')])")
+
+        # variables with random names are deleted after their references are released
+        for i in range(10):
+            assert await (await nb.store(i)).receive() == i
+        await nb.get('a')
+
+        await nb.collect()
+        assert await count() == 0
+
+        # custom names are kept
+        await nb.store(1, 'kept')
+        await nb.collect()
+        assert await nb.kept == 1
+
+        # scopes delete variables even if references are still in use
+        async with nb.scope():
+            x = await nb.store(5)
+            y = await nb.get('a')
+            assert await count() == 2
+
+        assert await count() == 0
+        with pytest.raises(Exception):
+            await x
+        with pytest.raises(Exception):
+            await y
+
+        # released names are only deleted by `collect`, even after many cells
+        names = [(await nb.store(i)).name for i in range(150)]
+        await nb.execute_code('pass')
+
+        assert await count() == 150
+        assert await nb.ref(f'{names[0]} + {names[-1]}').receive() == 149
+
+        await nb.collect()
+        assert await count() == 0
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import shutil
+
+import pyarrow
+import pytest
+
+from jptest2 import DuckDBNotebook, SQLiteNotebook
+
+
+@pytest.mark.asyncio
+async def test_sqlite_execute():
+    async with SQLiteNotebook('sql.ipynb') as nb:
+        await nb.execute_cells('schema')
+        cell = await nb.execute_cell('query')
+
+        assert cell.last_execution_result == [(2, 20), (3, 20)]
+
+
+@pytest.mark.asyncio
+async def test_duckdb_fetch():
+    # tuples
+    async with DuckDBNotebook('sql.ipynb') as nb:
+        await nb.execute_cells('schema')
+        cell = await nb.execute_cell('query')
+
+        assert cell.last_execution_result == (['id', 'value'], [(2, 20), (3, 20)])
+
+    # arrow
+    async with DuckDBNotebook('sql.ipynb', fetch='arrow') as nb:
+        await nb.execute_cells('schema')
+        cell = await nb.execute_cell('query')
+
+        assert isinstance(cell.last_execution_result, pyarrow.Table)
+        assert cell.last_execution_result.to_pydict() == {'id': [2, 3], 'value': [20, 20]}
+
+    # reader
+    async with DuckDBNotebook('sql.ipynb', fetch='reader') as nb:
+        await nb.execute_cells('schema')
+        cell = await nb.execute_cell('query')
+
+        assert isinstance(cell.last_execution_result, pyarrow.RecordBatchReader)
+        assert cell.last_execution_result.read_all().num_rows == 2
+
+
+def test_duckdb_shared_executor():
+    a = DuckDBNotebook('sql.ipynb')
+    b = DuckDBNotebook('sql.ipynb')
+    assert a.executor is b.executor
+
+    DuckDBNotebook.shutdown_executor()
+    assert DuckDBNotebook.EXECUTOR is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('kernel', [SQLiteNotebook, DuckDBNotebook])
+async def test_template(kernel):
+    async with kernel('sql.ipynb') as nb:
+        await nb.execute_cells('schema')
+        template = await nb.snapshot()
+
+    try:
+        for _ in range(2):
+            async with kernel('sql.ipynb', template=template) as nb:
+                cell = await nb.execute_code('SELECT COUNT(*) FROM numbers')
+                assert cell.last_execution_result in ([(4,)], (['count_star()'], [(4,)]))
+
+                # changes do not affect the template
+                await nb.execute_code('DELETE FROM numbers')
+    finally:
+        shutil.rmtree(os.path.dirname(template))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('kernel', [SQLiteNotebook, DuckDBNotebook])
+async def test_compare_queries(kernel):
+    async with kernel('sql.ipynb') as nb:
+        await nb.execute_cells('schema')
+        query = nb.get_code_cell('query').source
+
+        # order does not matter
+        result = await nb.compare_queries(query, 'SELECT id, value FROM numbers WHERE id IN (3, 2) ORDER BY id DESC')
+        assert result
+        assert result.missing == [] and result.unexpected == []
+
+        # duplicates matter
+        result = await nb.compare_queries('SELECT value FROM numbers WHERE value = 20',
+                                          'SELECT DISTINCT value FROM numbers WHERE value = 20')
+        assert not result
+        assert result.unexpected == [(20,)]
+
+        # nulls are equal
+        assert await nb.compare_queries('SELECT value FROM numbers', 'SELECT value FROM numbers ORDER BY id DESC;')
+
+        # missing rows and column count
+        result = await nb.compare_queries('SELECT id FROM numbers WHERE id < 3', 'SELECT id FROM numbers')
+        assert sorted(result.missing) == [(3,), (4,)]
+
+        result = await nb.compare_queries('SELECT id FROM numbers', 'SELECT id, value FROM numbers')
+        assert not result and result.message is not None
+
+        # tables named like common table expressions
+        await nb.execute_code('''
+            CREATE TABLE l (x INTEGER);
+            CREATE TABLE r (x INTEGER);
+            INSERT INTO l VALUES (7), (8);
+            INSERT INTO r VALUES (1), (2);
+        ''')
+
+        result = await nb.compare_queries('SELECT x FROM l', 'SELECT x FROM r')
+        assert sorted(result.missing) == [(1,), (2,)]
+        assert sorted(result.unexpected) == [(7,), (8,)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('kernel', [SQLiteNotebook, DuckDBNotebook])
+async def test_profiles(kernel):
+    async with kernel('sql.ipynb', explain=True) as nb:
+        cell = await nb.execute_cell('schema')
+        assert len(cell.profiles) == 2
+        assert cell.execution_time >= 0
+
+        cell = await nb.execute_cell('query')
+        profile, = cell.profiles
+        assert profile.plan
+        assert profile.has_full_scan('numbers')
+        assert not profile.has_cross_join
+        assert profile.problems(full_scans=False) == []
+
+        cell = await nb.execute_code('SELECT * FROM numbers a, numbers b')
+        profile, = cell.profiles
+        assert profile.has_cross_join
+        assert 'cross join' in profile.problems()[-1]
+        assert profile.problems(max_time=0.0)
+
+    # plans are only captured on request
+    async with kernel('sql.ipynb') as nb:
+        cell = await nb.execute_cell('schema')
+        assert all(p.plan is None for p in cell.profiles)
+
+
+@pytest.mark.asyncio
+async def test_profiles_index():
+    async with SQLiteNotebook('sql.ipynb', explain=True) as nb:
+        await nb.execute_cell('schema')
+
+        cell = await nb.execute_code('SELECT * FROM numbers WHERE id = 1')
+        assert not cell.profiles[0].has_full_scan()
+
+        cell = await nb.execute_code('SELECT * FROM numbers a JOIN numbers b ON a.id = b.value')
+        assert not cell.profiles[0].has_cross_join
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('kernel, infinite', [
+    (SQLiteNotebook, 'WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r) SELECT i AS x FROM r'),
+    (DuckDBNotebook, 'SELECT a.range * b.range AS x FROM range(1000000) a CROSS JOIN range(1000000) b')
+])
+async def test_iter_rows(kernel, infinite):
+    async with kernel('sql.ipynb') as nb:
+        await nb.execute_cells('schema')
+
+        # batches
+        cell = nb.get_code_cell('query')
+        assert [batch async for batch in cell.iter_rows(batch_size=1)] == [[(2, 20)], [(3, 20)]]
+
+        # row cap, previous statements are executed
+        cell = await nb.execute_code('SELECT 1')
+        cell.raw_cell['source'] = 'CREATE TABLE numbers2 AS SELECT * FROM numbers;\nSELECT id FROM numbers2 ORDER BY id'
+        assert [batch async for batch in cell.iter_rows(batch_size=2, max_rows=3)] == [[(1,), (2,)], [(3,)]]
+
+        # early stop
+        cell.raw_cell['source'] = infinite
+
+        rows = []
+        iterator = cell.iter_rows(batch_size=10)
+        async for batch in iterator:
+            rows.extend(batch)
+            if len(rows) >= 30:
+                break
+        await iterator.aclose()
+
+        assert len(rows) == 30
+
+        # cancellation
+        cell.raw_cell['source'] = f'SELECT * FROM ({infinite}) WHERE x < 0'
+
+        async def consume():
+            async for _ in cell.iter_rows():
+                pass
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(consume(), 0.5)
+
+        # notebook is still usable
+        cell = await nb.execute_cell('query')
+        assert len(cell.profiles) == 1
+
+    with pytest.raises(AssertionError, match='does not support streaming rows'):
+        from jptest2 import Notebook
+        Notebook('sql.ipynb', None, False).get_code_cell('query').iter_rows()
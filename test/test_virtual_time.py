@@ -0,0 +1,68 @@
+import datetime
+import time
+
+import pytest
+
+from jptest2 import PythonNotebook
+
+
+@pytest.mark.asyncio
+async def test_virtual_time():
+    async with PythonNotebook('functions.ipynb', virtual_time=True) as nb:
+        start = time.monotonic()
+
+        await nb.execute_code('''
+            import asyncio
+            import datetime
+            import time
+            from time import sleep
+
+            t0, m0, d0 = time.time(), time.monotonic(), datetime.datetime.now()
+
+            for _ in range(60):
+                sleep(60)
+
+            await asyncio.sleep(30)
+
+            t1, m1, d1 = time.time(), time.monotonic(), datetime.datetime.now()
+        ''')
+
+        # sleeps are skipped but all clocks advance consistently
+        assert time.monotonic() - start < 30
+        assert 3630 <= await nb.ref('t1 - t0').receive() < 3640
+        assert 3630 <= await nb.ref('m1 - m0').receive() < 3640
+        assert 3630 <= (await nb.ref('d1 - d0').receive()).total_seconds() < 3640
+
+        # dates are received as the original classes
+        value = await nb.ref('d1').receive()
+        assert type(value) is datetime.datetime
+        assert await nb.ref('repr(datetime.date(2020, 1, 1))').receive() == 'datetime.date(2020, 1, 1)'
+
+        # invalid sleeps still fail
+        with pytest.raises(Exception):
+            await nb.ref('time.sleep(-1)').receive()
+
+
+@pytest.mark.asyncio
+async def test_virtual_time_extensions():
+    async with PythonNotebook('functions.ipynb', virtual_time=True) as nb:
+        await nb.execute_code('''
+            import time
+            from datetime import datetime
+
+            import numpy as np
+            import pandas as pd
+
+            start = datetime.now()
+            time.sleep(600)
+
+            timestamp = pd.Timestamp(datetime.now())
+            dates = pd.to_datetime(['2020-01-01', '2020-01-02']) + pd.Timedelta(days=1)
+        ''')
+
+        # extensions still use the original classes
+        assert await nb.ref('isinstance(timestamp, datetime)').receive()
+        assert await nb.ref('isinstance(datetime(2020, 1, 1), datetime)').receive()
+        assert await nb.ref('(timestamp - start).total_seconds() >= 600').receive()
+        assert await nb.ref('str(dates[0].date())').receive() == '2020-01-02'
+        assert await nb.ref('int(np.arange(5).sum())').receive() == 10
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from jptest2 import PythonNotebook, ZygoteKernelProvider
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not ZygoteKernelProvider.supported(), reason='forking is not supported')
+async def test_forked_kernel():
+    async with ZygoteKernelProvider(['fractions']) as provider:
+        async with \
+                PythonNotebook('references.ipynb', kernel_provider=provider) as nb1, \
+                PythonNotebook('references.ipynb', kernel_provider=provider) as nb2:
+            await nb1.execute_code('''
+                import os, sys
+                a = 5
+            ''')
+            await nb2.execute_code('''
+                import os, sys
+                a = 6
+            ''')
+
+            # kernels are independent processes
+            assert await nb1.ref('a') == 5
+            assert await nb2.ref('a') == 6
+            assert await nb1.ref('os').getpid() != await nb2.ref('os').getpid()
+
+            # preloaded modules are available and the working directory is inherited
+            assert await nb1.ref('sys').modules.__contains__('fractions')
+            assert await nb1.ref('os').getcwd() == os.getcwd()
+
+            # subprocesses can still be awaited
+            await nb1.execute_code('''
+                import subprocess
+                code = subprocess.run(['true']).returncode
+            ''')
+            assert await nb1.ref('code') == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not ZygoteKernelProvider.supported(), reason='forking is not supported')
+async def test_fork():
+    async with PythonNotebook('references.ipynb') as nb:
+        await nb.execute_cells('objects')
+        await nb.execute_code('a = 1')
+
+        async with await nb.fork() as child:
+            # state is copied
+            assert await child.ref('a') == 1
+            assert await child.ref('nb_list') == [1, 'a', None, 'b']
+
+            # but changes are not shared
+            await child.execute_code('''
+                a = 2
+                nb_list.append('c')
+            ''')
+
+            assert await child.ref('a') == 2
+            assert await nb.ref('a') == 1
+            assert await nb.ref('nb_list') == [1, 'a', None, 'b']
+
+            # forks can be forked again
+            async with await child.fork() as grandchild:
+                assert await grandchild.ref('a') == 2
+
+        # parent is still usable
+        await nb.execute_code('a = 3')
+        assert await nb.ref('a') == 3